@@ -0,0 +1,350 @@
+"""Request handling shared by web.py and asgi.py, which only adapt it to Flask and Quart."""
+import json
+import os
+import secrets
+import time
+from functools import wraps
+from typing import TYPE_CHECKING, Any, Callable, Dict, Mapping, Optional, Tuple
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from limits import parse_many
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+from services import registry
+from draw_request import DrawRequestError, run_draw
+from events import Events
+from shared_store import SharedCache, close_connections
+from static_cache import CachedResponse
+import metrics
+
+if TYPE_CHECKING:
+    import requests
+
+API_KEY = os.environ.get('API_KEY')
+TURNSTILE_SECRET_KEY = os.environ.get('TURNSTILE_SECRET_KEY')
+TURNSTILE_SITE_KEY = os.environ.get('TURNSTILE_SITE_KEY')
+# Overridden by the load-test harness to point at a local stub.
+TURNSTILE_VERIFY_URL = os.environ.get('TURNSTILE_VERIFY_URL') or 'https://challenges.cloudflare.com/turnstile/v0/siteverify'
+RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+
+# A draw whose sender has made no progress for this long is assumed dead and may be resumed.
+STALLED_DRAW_SECONDS = 300
+
+# Cloudflare rejects a token the second time it is checked, so results are remembered for the
+# token's lifetime for retries of the same request: same token, Idempotency-Key and body.
+TURNSTILE_TOKEN_TTL = 300
+
+TEMPLATES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+Reply = Tuple[Dict[str, Any], int]
+
+
+class ApiError(Exception):
+    """A request turned away before it reaches a handler, with the HTTP status to answer."""
+
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.status = status
+
+
+class ApiRequest:
+    """The parts of an HTTP request the handlers read, whichever framework received it."""
+
+    def __init__(self, endpoint: str, headers: Mapping[str, str], body: bytes, remote_addr: str):
+        self.endpoint = endpoint
+        self.headers = headers
+        self.body = body
+        self.remote_addr = remote_addr
+        self._json: Any = None
+        self._parsed = False
+
+    @property
+    def json(self) -> Any:
+        """The body parsed as JSON, or None when it is empty or not JSON."""
+        if not self._parsed:
+            try:
+                self._json = json.loads(self.body) if self.body else None
+            except ValueError:
+                self._json = None
+            self._parsed = True
+        return self._json
+
+
+def limit(limits: str, exempt_when: Optional[Callable[['Api', ApiRequest], bool]] = None):
+    """
+    Per-client, per-endpoint rate limit, counted in storage shared by every worker (and both apps).
+
+    Requests for which `exempt_when` is true are not counted.
+    """
+    items = parse_many(limits)
+
+    def decorator(f):
+        if not RATELIMIT_ENABLED:
+            return f
+
+        @wraps(f)
+        def decorated_function(self: 'Api', request: ApiRequest, *args):
+            if exempt_when is not None and exempt_when(self, request):
+                return f(self, request, *args)
+            for item in items:
+                if not self.rate_limiter.hit(item, request.endpoint, request.remote_addr):
+                    raise ApiError(f'Rate limit exceeded: {item}', 429)
+            return f(self, request, *args)
+        return decorated_function
+    return decorator
+
+
+def require_turnstile(f):
+    @wraps(f)
+    def decorated_function(self: 'Api', request: ApiRequest, *args):
+        if TURNSTILE_SECRET_KEY:
+            data = request.json
+            turnstile_token = data.get('turnstile_token') if isinstance(data, dict) else None
+            if not turnstile_token:
+                raise ApiError('Turnstile verification required', 400)
+            if not self.verify_turnstile(turnstile_token, self.turnstile_retry_key(request, turnstile_token)):
+                raise ApiError('Turnstile verification failed. Please try again.', 403)
+        return f(self, request, *args)
+    return decorated_function
+
+
+def require_api_key(f):
+    """
+    Optional: For server-to-server API calls only
+    Regular users don't need to provide this
+    """
+    @wraps(f)
+    def decorated_function(self: 'Api', request: ApiRequest, *args):
+        provided_key = request.headers.get('X-API-Key')
+
+        # If API key is provided, validate it (for programmatic access)
+        if provided_key:
+            if not API_KEY:
+                raise ApiError('Server configuration error', 500)
+            if not secrets.compare_digest(provided_key, API_KEY):
+                raise ApiError('Invalid API key', 403)
+
+        # If no API key provided, that's fine - Turnstile + rate limiting protect us
+        return f(self, request, *args)
+    return decorated_function
+
+
+def require_event_owner(f):
+    """Only the holder of the owner token `create_event` returned may change or draw an event."""
+    @wraps(f)
+    def decorated_function(self: 'Api', request: ApiRequest, event_id: str, *args):
+        if not self.events.is_owner(event_id, request.headers.get('X-Event-Token')):
+            raise ApiError('Missing or invalid X-Event-Token for this event', 403)
+        return f(self, request, event_id, *args)
+    return decorated_function
+
+
+def observe_request(endpoint: Optional[str], method: str, status: int, started: float) -> None:
+    endpoint = endpoint or 'unknown'
+    metrics.observe('http_request_seconds', time.perf_counter() - started, endpoint=endpoint, method=method)
+    metrics.inc('http_requests_total', endpoint=endpoint, status=status)
+
+
+class Api:
+    """
+    The draw, event and status endpoints, over a job queue with JobQueue's blocking interface.
+
+    Handlers block on SQLite, Turnstile and the draw itself, so asgi.py runs
+    them on worker threads.
+    """
+
+    def __init__(self, queue):
+        self.queue = queue
+        self.store = queue.store
+        self.events = Events(self.store)
+        self.turnstile_cache = SharedCache(os.environ.get('SHARED_STATE_PATH'), namespace='turnstile')
+        self.rate_limiter = FixedWindowRateLimiter(
+            storage_from_string(os.environ.get('RATELIMIT_STORAGE_URI') or f"sqlite://{self.turnstile_cache.path}")
+        )
+        # The page and public config, rendered once per process (or in the gunicorn master) and served from memory.
+        self.cached: Dict[str, CachedResponse] = {}
+        self._turnstile_session: Optional[Tuple[int, 'requests.Session']] = None
+
+    def preload(self) -> None:
+        """
+        Load shared, read-only state once in a gunicorn master before it forks workers (see gunicorn.conf.py).
+
+        Loads the configuration, imports the email backend's SDK and compiles its
+        template, so workers inherit them copy-on-write instead of each doing it
+        on their first request. Clients and sessions are still created per
+        worker, and the master's SQLite connections are closed so no worker
+        inherits one. The page and public config are rendered and compressed.
+        """
+        registry.preload('email')
+        if TURNSTILE_SECRET_KEY:
+            import requests.adapters  # noqa: F401
+        self.index_page()
+        self.config_page()
+        self.store.close()
+        close_connections()
+
+    def handle(self, handler: Callable[..., Reply], request: ApiRequest, *args) -> Reply:
+        """Run a handler, answering the caller's mistakes with 4xx and anything else with 500."""
+        try:
+            return handler(request, *args)
+        except ApiError as e:
+            return {'error': str(e)}, e.status
+        except DrawRequestError as e:
+            return {'error': str(e)}, 400
+        except Exception as e:
+            return {'error': str(e)}, 500
+
+    def index_page(self) -> CachedResponse:
+        if 'index' not in self.cached:
+            environment = Environment(loader=FileSystemLoader(TEMPLATES), autoescape=select_autoescape())
+            html = environment.get_template('index.html').render()
+            self.cached['index'] = CachedResponse(html.encode(), 'text/html; charset=utf-8')
+        return self.cached['index']
+
+    def config_page(self) -> CachedResponse:
+        if 'config' not in self.cached:
+            body = json.dumps({
+                'turnstile_site_key': TURNSTILE_SITE_KEY,
+                'turnstile_enabled': bool(TURNSTILE_SECRET_KEY)
+            })
+            self.cached['config'] = CachedResponse(body.encode(), 'application/json')
+        return self.cached['config']
+
+    def turnstile_session(self) -> 'requests.Session':
+        """Keep-alive session for Turnstile, created per process so forked workers don't share sockets."""
+        if self._turnstile_session is None or self._turnstile_session[0] != os.getpid():
+            import requests
+            import requests.adapters
+            session = requests.Session()
+            session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=8))
+            self._turnstile_session = (os.getpid(), session)
+        return self._turnstile_session[1]
+
+    def turnstile_retry_key(self, request: ApiRequest, token: str) -> Optional[str]:
+        """Cache key for retries of this request, or None without an Idempotency-Key, when a repeat can't be told from a replay."""
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if not idempotency_key:
+            return None
+        return SharedCache.key(token.encode(), idempotency_key.encode(), request.body)
+
+    def verify_turnstile(self, token: str, retry_key: Optional[str] = None) -> bool:
+        """Verify Cloudflare Turnstile token"""
+        if retry_key:
+            cached = self.turnstile_cache.get(retry_key)
+            if cached is not None:
+                return cached == '1'
+
+        try:
+            with metrics.span('turnstile_verify'):
+                response = self.turnstile_session().post(
+                    TURNSTILE_VERIFY_URL,
+                    data={
+                        'secret': TURNSTILE_SECRET_KEY,
+                        'response': token
+                    },
+                    timeout=5
+                )
+            success = response.json().get('success', False)
+        except Exception as e:
+            print(f"Turnstile verification failed: {e}")
+            return False
+
+        if retry_key:
+            self.turnstile_cache.set(retry_key, '1' if success else '0', TURNSTILE_TOKEN_TTL)
+        return success
+
+    def replayed_draw(self, request: ApiRequest) -> Optional[str]:
+        """The job an earlier request with this request's Idempotency-Key started, if any."""
+        idempotency_key = request.headers.get('Idempotency-Key')
+        return self.store.find(idempotency_key) if idempotency_key else None
+
+    # A retry of a draw that was already accepted only reports (or resumes) it, so it is not counted.
+    @limit("3 per hour", exempt_when=lambda api, request: api.replayed_draw(request) is not None)
+    @require_turnstile
+    @require_api_key
+    def perform_draw(self, request: ApiRequest) -> Reply:
+        job_id = self.replayed_draw(request)
+        if job_id:
+            self.queue.resume(job_id, registry.email_service(), stale_after=STALLED_DRAW_SECONDS)
+            return draw_accepted(job_id)
+
+        results, options = run_draw(request.json)
+        job_id = self.queue.submit(
+            results, registry.email_service(), idempotency_key=request.headers.get('Idempotency-Key'), **options
+        )
+        return draw_accepted(job_id)
+
+    @limit("120 per minute")
+    def draw_status(self, request: ApiRequest, job_id: str) -> Reply:
+        """Report per-recipient notification progress for a draw"""
+        job = self.store.get(job_id)
+        if job is None:
+            return {'error': 'Draw not found'}, 404
+        return job, 200
+
+    @limit("20 per hour")
+    @require_turnstile
+    @require_api_key
+    def create_event(self, request: ApiRequest) -> Reply:
+        """Store a roster as a named event that can be drawn, changed and re-drawn by id"""
+        event_id, owner_token = self.events.create(request.json)
+        return {
+            'success': True,
+            'event_id': event_id,
+            'owner_token': owner_token,
+            'version': 1,
+            'event_url': f'/api/events/{event_id}'
+        }, 201
+
+    @limit("120 per minute")
+    def get_event(self, request: ApiRequest, event_id: str) -> Reply:
+        """The event's roster; contact details and the draw id only for its owner"""
+        event = self.events.get(event_id, owner=self.events.is_owner(event_id, request.headers.get('X-Event-Token')))
+        if event is None:
+            return {'error': 'Event not found'}, 404
+        return event, 200
+
+    @limit("60 per hour")
+    @require_api_key
+    @require_event_owner
+    def replace_event(self, request: ApiRequest, event_id: str) -> Reply:
+        return event_updated(event_id, self.events.replace(event_id, request.json))
+
+    @limit("60 per hour")
+    @require_api_key
+    @require_event_owner
+    def add_event_participant(self, request: ApiRequest, event_id: str) -> Reply:
+        return event_updated(event_id, self.events.add_participant(event_id, request.json))
+
+    @limit("60 per hour")
+    @require_api_key
+    @require_event_owner
+    def remove_event_participant(self, request: ApiRequest, event_id: str, name: str) -> Reply:
+        return event_updated(event_id, self.events.remove_participant(event_id, name))
+
+    @limit("3 per hour")
+    @require_turnstile
+    @require_api_key
+    @require_event_owner
+    def draw_event(self, request: ApiRequest, event_id: str) -> Reply:
+        """Draw an event; after the first draw only changed assignments are re-drawn and re-sent"""
+        drawn = self.events.draw(event_id)
+        if drawn is None:
+            return {'error': 'Event not found'}, 404
+        results, options, notify = drawn
+        job_id = self.queue.submit(results, registry.email_service(), notify=notify, **options)
+        self.events.drawn(event_id, job_id)
+        return draw_accepted(job_id)
+
+
+def draw_accepted(job_id: str) -> Reply:
+    return {
+        'success': True,
+        'job_id': job_id,
+        'status_url': f'/api/draw/{job_id}'
+    }, 202
+
+
+def event_updated(event_id: str, version: Optional[int]) -> Reply:
+    if version is None:
+        return {'error': 'Event not found'}, 404
+    return {'success': True, 'event_id': event_id, 'version': version}, 200
@@ -0,0 +1,129 @@
+"""ASGI variant of the web app, sending notifications as tasks on its event loop instead of a thread pool."""
+import asyncio
+import os
+import time
+from quart import Quart, Response, g, request, jsonify
+from services import registry
+from api import Api, ApiRequest, observe_request
+from draw_store import DrawStore
+from jobs import AsyncJobQueue, ThreadedJobQueue
+from static_cache import CachedResponse
+import metrics
+
+app = Quart(__name__)
+
+job_queue = AsyncJobQueue(DrawStore(os.environ.get('DRAW_STORE_PATH')))
+# Handlers block on SQLite, Turnstile and the draw, so they run on threads and queue sends back onto the loop.
+threaded_queue = ThreadedJobQueue(job_queue)
+api = Api(threaded_queue)
+
+
+def preload() -> None:
+    """Load shared, read-only state in a gunicorn master before it forks workers (see Api.preload)."""
+    api.preload()
+
+
+@app.before_serving
+async def start_queue():
+    threaded_queue.loop = asyncio.get_running_loop()
+
+
+@app.after_serving
+async def close_services():
+    # Let in-flight sends finish rather than cancelling them and leaving them for a stale resume.
+    await job_queue.wait()
+    for service in registry.created():
+        if hasattr(service, 'aclose'):
+            await service.aclose()
+
+
+async def respond(handler, *args):
+    """Run a shared handler on the current request, off the event loop."""
+    api_request = ApiRequest(request.endpoint, request.headers, await request.get_data(), request.remote_addr or '')
+    reply, status = await asyncio.to_thread(api.handle, handler, api_request, *args)
+    return jsonify(reply), status
+
+
+@app.before_request
+async def start_request_timer():
+    if metrics.enabled:
+        g.request_started = time.perf_counter()
+
+
+@app.after_request
+async def record_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        observe_request(request.endpoint, request.method, response.status_code, started)
+    return response
+
+
+def serve_cached(cached: CachedResponse) -> Response:
+    """The cached body in the client's preferred encoding, or an empty 304 if its copy is current."""
+    status, headers, body = cached.respond(request.headers.get('Accept-Encoding', ''), request.headers.get('If-None-Match', ''))
+    return Response(body, status=status, headers=headers)
+
+
+# Served from memory, so rate limiting would cost more than the response (and block offices behind one address).
+@app.route('/')
+async def index():
+    return serve_cached(api.index_page())
+
+
+@app.route('/api/config', methods=['GET'])
+async def get_config():
+    """Return public configuration like Turnstile site key"""
+    return serve_cached(api.config_page())
+
+
+@app.route('/api/draw', methods=['POST'])
+async def perform_draw():
+    return await respond(api.perform_draw)
+
+
+@app.route('/api/draw/<job_id>', methods=['GET'])
+async def draw_status(job_id):
+    return await respond(api.draw_status, job_id)
+
+
+@app.route('/api/events', methods=['POST'])
+async def create_event():
+    return await respond(api.create_event)
+
+
+@app.route('/api/events/<event_id>', methods=['GET'])
+async def get_event(event_id):
+    return await respond(api.get_event, event_id)
+
+
+@app.route('/api/events/<event_id>', methods=['PUT'])
+async def replace_event(event_id):
+    return await respond(api.replace_event, event_id)
+
+
+@app.route('/api/events/<event_id>/participants', methods=['POST'])
+async def add_event_participant(event_id):
+    return await respond(api.add_event_participant, event_id)
+
+
+@app.route('/api/events/<event_id>/participants/<name>', methods=['DELETE'])
+async def remove_event_participant(event_id, name):
+    return await respond(api.remove_event_participant, event_id, name)
+
+
+@app.route('/api/events/<event_id>/draw', methods=['POST'])
+async def draw_event(event_id):
+    return await respond(api.draw_event, event_id)
+
+
+@app.route('/metrics', methods=['GET'])
+async def get_metrics():
+    """Prometheus metrics for this worker process (enabled with METRICS_ENABLED)"""
+    if not metrics.enabled:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+if __name__ == '__main__':
+    port = int(os.environ.get('PORT', 80))
+    app.run(host='0.0.0.0', port=port)
@@ -0,0 +1,105 @@
+"""Notification dispatch benchmarks against the local fake provider."""
+import argparse
+import json
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional
+from models import Participant, DrawResult, DeliveryResult
+from fake_service import FakeNotificationService, FakeProvider
+from benchmarks.stats import percentile
+
+
+def _results(n: int) -> List[DrawResult]:
+    people = [Participant(name=f"person-{i}", email=f"person-{i}@example.com") for i in range(n)]
+    return [DrawResult(giver=people[i], receiver=people[(i + 1) % n]) for i in range(n)]
+
+
+def _provider_stats(service: FakeNotificationService) -> Dict[str, int]:
+    if service.session is None:
+        with service.provider.lock:
+            return dict(service.provider.stats)
+    return service.session.get(f"{service.url}/stats", timeout=10).json()
+
+
+def benchmark(
+    messages: int,
+    concurrency: int,
+    latency: float,
+    error_rate: float,
+    throttle_rate: Optional[float],
+    rate_limit: Optional[float],
+    url: Optional[str]
+) -> dict:
+    service = FakeNotificationService(
+        FakeProvider(latency, error_rate, throttle_rate),
+        url=url,
+        max_concurrency=concurrency,
+        rate_limit=rate_limit
+    )
+    results = _results(messages)
+    before = _provider_stats(service)
+
+    finished: List[float] = []
+    start = time.perf_counter()
+
+    def on_delivery(i: int, delivery: DeliveryResult) -> None:
+        finished.append(time.perf_counter() - start)
+
+    deliveries = service.dispatch(results, on_delivery=on_delivery)
+    elapsed = time.perf_counter() - start
+
+    after = _provider_stats(service)
+    provider = {key: after[key] - before.get(key, 0) for key in after}
+    sent = sum(1 for d in deliveries if d.status == 'sent')
+    return {
+        'benchmark': 'dispatch',
+        'transport': 'http' if url else 'in-process',
+        'messages': messages,
+        'concurrency': concurrency,
+        # Over HTTP the provider's behaviour is set when starting fake_service.py.
+        'latency_s': None if url else latency,
+        'error_rate': None if url else error_rate,
+        'throttle_rate': None if url else throttle_rate,
+        'rate_limit': rate_limit,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_per_s': round(sent / elapsed, 1) if elapsed else None,
+        'sent': sent,
+        'failed': sum(1 for d in deliveries if d.status == 'failed'),
+        'delivery_s': {
+            'median': round(statistics.median(finished), 3),
+            'p95': round(percentile(finished, 0.95), 3),
+            'max': round(max(finished), 3),
+        },
+        'provider': provider,
+        'attempts_per_message': round(sum(provider.values()) / messages, 3),
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark notification dispatch against the fake provider")
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--latency', type=float, default=0.05, help='Mean provider latency in seconds (in-process only)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of transient 503s (in-process only)')
+    parser.add_argument('--throttle-rate', type=float, default=None, help='Provider quota in sends per second (in-process only)')
+    parser.add_argument('--rate-limit', type=float, default=None, help='Client-side pacing in sends per second')
+    parser.add_argument('--url', type=str, default=None, help='Send over HTTP to a running fake_service.py')
+    parser.add_argument('--output', type=str, default=None, help='Write JSON lines here instead of stdout')
+    args = parser.parse_args(argv)
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        for concurrency in args.concurrency:
+            record = benchmark(
+                args.messages, concurrency, args.latency, args.error_rate, args.throttle_rate, args.rate_limit, args.url
+            )
+            out.write(json.dumps(record) + '\n')
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+"""Draw engine benchmarks."""
+import argparse
+import itertools
+import json
+import math
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from typing import Callable, Dict, List, Tuple
+from models import Participant, Couple, ExclusionGroup, Block
+from draw_service import DrawService
+from benchmarks.stats import percentile
+
+Roster = Tuple[List[Participant], List[Couple], List[ExclusionGroup], List[Block]]
+
+
+def _people(n: int) -> List[Participant]:
+    return [Participant(name=f"person-{i}", email=f"person-{i}@example.com") for i in range(n)]
+
+
+def _chunks(people: List[Participant], size: int) -> List[ExclusionGroup]:
+    return [
+        ExclusionGroup(members=people[i:i + size], name=f"group-{i // size}")
+        for i in range(0, len(people), size)
+        if len(people[i:i + size]) > 1
+    ]
+
+
+def open_roster(n: int, rng: random.Random) -> Roster:
+    return _people(n), [], [], []
+
+
+def couples_roster(n: int, rng: random.Random) -> Roster:
+    people = _people(n)
+    paired = people[:int(n * 0.8) // 2 * 2]
+    couples = [Couple(person1=paired[i], person2=paired[i + 1]) for i in range(0, len(paired), 2)]
+    return people, couples, [], []
+
+
+def households_roster(n: int, rng: random.Random) -> Roster:
+    people = _people(n)
+    return people, [], _chunks(people, 4), []
+
+
+def teams_roster(n: int, rng: random.Random) -> Roster:
+    people = _people(n)
+    groups = _chunks(people, max(2, min(25, n // 4)))
+    last_year = [Block(giver=p, receiver=people[rng.randrange(n)]) for p in people]
+    return people, [], groups, [b for b in last_year if b.giver != b.receiver]
+
+
+def blocks_roster(n: int, rng: random.Random) -> Roster:
+    people = _people(n)
+    blocks = [
+        Block(giver=p, receiver=people[rng.randrange(n)])
+        for p in people
+        for _ in range(min(5, max(1, n // 5)))
+    ]
+    return people, [], [], [b for b in blocks if b.giver != b.receiver]
+
+
+def near_infeasible_roster(n: int, rng: random.Random) -> Roster:
+    """Half the roster in one team: feasible, but only just (every team member must draw an outsider)."""
+    people = _people(n)
+    half = n // 2
+    rest = people[half:]
+    couples = [Couple(person1=rest[i], person2=rest[i + 1]) for i in range(0, len(rest) - 1, 4)]
+    return people, couples, [ExclusionGroup(members=people[:half], name="big-team")], []
+
+
+def infeasible_roster(n: int, rng: random.Random) -> Roster:
+    """One team larger than everyone else combined: the engine must prove there is no draw."""
+    people = _people(n)
+    return people, [], [ExclusionGroup(members=people[:n // 2 + 1], name="too-big")], []
+
+
+SCENARIOS: Dict[str, Callable[[int, random.Random], Roster]] = {
+    'open': open_roster,
+    'couples': couples_roster,
+    'households': households_roster,
+    'teams': teams_roster,
+    'blocks': blocks_roster,
+    'near_infeasible': near_infeasible_roster,
+    'infeasible': infeasible_roster,
+}
+
+
+def benchmark(scenario: str, size: int, repeats: int, seed: int, workers: int = 1, mode: str = 'random') -> dict:
+    rng = random.Random(seed)
+    participants, couples, groups, blocks = SCENARIOS[scenario](size, rng)
+
+    build_start = time.perf_counter()
+    service = DrawService(participants, couples, groups, blocks, mode=mode)
+    build_ms = (time.perf_counter() - build_start) * 1000
+
+    latencies = []
+    failures = 0
+    stats: Counter = Counter()
+    for _ in range(repeats):
+        start = time.perf_counter()
+        try:
+            service.draw(workers=workers)
+        except ValueError:
+            failures += 1
+        latencies.append((time.perf_counter() - start) * 1000)
+        stats.update(service.stats)
+
+    tracemalloc.start()
+    try:
+        DrawService(participants, couples, groups, blocks, mode=mode).draw()
+    except ValueError:
+        pass
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'benchmark': 'draw',
+        'scenario': scenario,
+        'size': size,
+        'workers': workers,
+        'mode': mode,
+        'couples': len(couples),
+        'groups': len(groups),
+        'blocks': len(blocks),
+        'repeats': repeats,
+        'index_build_ms': round(build_ms, 3),
+        'latency_ms': {
+            'min': round(min(latencies), 3),
+            'median': round(statistics.median(latencies), 3),
+            'p95': round(percentile(latencies, 0.95), 3),
+            'max': round(max(latencies), 3),
+        },
+        'failures': failures,
+        'failure_rate': failures / repeats,
+        'mean_stats': {key: value / repeats for key, value in sorted(stats.items())},
+        'peak_memory_kb': round(peak_memory / 1024, 1),
+    }
+
+
+def uniformity(scenario: str, size: int, samples: int, seed: int, force_repair: bool) -> dict:
+    """
+    Chi-square of sampled draws against the uniform distribution over every valid draw.
+
+    Only practical for small rosters, where the valid draws can be enumerated.
+    With `force_repair`, rejection sampling is disabled so the matching and
+    swap-mixing path is measured on its own.
+    """
+    random.seed(seed)
+    participants, couples, groups, blocks = SCENARIOS[scenario](size, random.Random(seed))
+    service = DrawService(participants, couples, groups, blocks)
+    if force_repair:
+        service.REJECTION_ATTEMPTS = 0
+
+    allows = service.index.allows
+    valid = [
+        permutation for permutation in itertools.permutations(range(size))
+        if all(allows(g, r) for g, r in enumerate(permutation))
+    ]
+    record = {
+        'benchmark': 'uniformity',
+        'scenario': scenario,
+        'size': size,
+        'engine_path': 'repair' if force_repair else 'default',
+        'valid_draws': len(valid),
+    }
+    if not valid:
+        return record
+
+    counts = Counter(tuple(service.draw().receivers) for _ in range(samples))
+    expected = samples / len(valid)
+    chi_square = sum((counts.get(p, 0) - expected) ** 2 / expected for p in valid)
+    record.update({
+        'samples': samples,
+        'draws_seen': len(counts),
+        'chi_square': round(chi_square, 2),
+        'degrees_of_freedom': len(valid) - 1,
+    })
+    return record
+
+
+def marginals(scenario: str, size: int, samples: int, seed: int, force_repair: bool) -> dict:
+    """
+    Chi-square of how often each giver draws each receiver, for rosters too large to enumerate.
+
+    Every valid pair is equally likely when draws are uniform and the
+    scenario treats everyone alike (open rosters and equal households), so
+    each giver's row of counts is compared with an even spread over the
+    receivers it may draw. `z` is the statistic's distance from its degrees
+    of freedom in standard deviations: a few at most for a well mixed draw.
+    """
+    random.seed(seed)
+    participants, couples, groups, blocks = SCENARIOS[scenario](size, random.Random(seed))
+    service = DrawService(participants, couples, groups, blocks)
+    if force_repair:
+        service.REJECTION_ATTEMPTS = 0
+
+    counts = [Counter() for _ in range(size)]
+    for _ in range(samples):
+        for giver, receiver in enumerate(service.draw().receivers):
+            counts[giver][receiver] += 1
+
+    allows = service.index.allows
+    chi_square = 0.0
+    degrees_of_freedom = 0
+    for giver in range(size):
+        allowed = [r for r in range(size) if allows(giver, r)]
+        expected = samples / len(allowed)
+        chi_square += sum((counts[giver].get(r, 0) - expected) ** 2 / expected for r in allowed)
+        degrees_of_freedom += len(allowed) - 1
+    return {
+        'benchmark': 'marginals',
+        'scenario': scenario,
+        'size': size,
+        'engine_path': 'repair' if force_repair else 'default',
+        'samples': samples,
+        'chi_square': round(chi_square, 1),
+        'degrees_of_freedom': degrees_of_freedom,
+        'z': round((chi_square - degrees_of_freedom) / math.sqrt(2 * degrees_of_freedom), 2),
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the Secret Santa draw engine")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--uniformity-size', type=int, default=6, help='Roster size for uniformity checks (0 to skip)')
+    parser.add_argument('--uniformity-samples', type=int, default=20000)
+    parser.add_argument('--marginal-size', type=int, default=200, help='Roster size for giver/receiver frequency checks (0 to skip)')
+    parser.add_argument('--marginal-samples', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=1, help='Processes per draw (sharded parallel draw when > 1)')
+    parser.add_argument('--mode', choices=DrawService.MODES, default='random')
+    parser.add_argument('--seed', type=int, default=2024)
+    parser.add_argument('--output', type=str, default=None, help='Write JSON lines here instead of stdout')
+    args = parser.parse_args(argv)
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        for scenario in args.scenarios:
+            for size in args.sizes:
+                out.write(json.dumps(benchmark(scenario, size, args.repeats, args.seed, args.workers, args.mode)) + '\n')
+                out.flush()
+
+        if args.uniformity_size:
+            for scenario in ('open', 'couples', 'blocks'):
+                for force_repair in (False, True):
+                    record = uniformity(scenario, args.uniformity_size, args.uniformity_samples, args.seed, force_repair)
+                    out.write(json.dumps(record) + '\n')
+
+        if args.marginal_size:
+            for scenario in ('open', 'households'):
+                for force_repair in (False, True):
+                    record = marginals(scenario, args.marginal_size, args.marginal_samples, args.seed, force_repair)
+                    out.write(json.dumps(record) + '\n')
+                    out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
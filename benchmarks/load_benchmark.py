@@ -0,0 +1,329 @@
+"""End-to-end load tests of the web tier on this machine."""
+import argparse
+import json
+import os
+import random
+import re
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+import requests
+from benchmarks.stats import percentile
+from metrics import LATENCY_BUCKETS, PREFIX
+
+# Histograms that show where a draw request's time goes, by report name.
+PHASES = {
+    'turnstile': ('turnstile_verify_seconds', {}),
+    'request': ('http_request_seconds', {'endpoint': 'perform_draw'}),
+    'draw': ('draw_seconds', {}),
+    'send': ('send_seconds', {}),
+    'delivery_attempt': ('delivery_attempt_seconds', {}),
+}
+SAMPLE_PATTERN = re.compile(r'^(\w+?)(?:\{(.*)\})? (\S+)$')
+LABEL_PATTERN = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def turnstile_stub(latency: float, error_rate: float) -> ThreadingHTTPServer:
+    """A local siteverify endpoint: accepts every token after `latency`, or fails with a 503 at `error_rate`."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            time.sleep(random.uniform(0.5, 1.5) * latency)
+            if random.random() < error_rate:
+                status, body = 503, b'{"success": false}'
+            else:
+                status, body = 200, b'{"success": true}'
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', _free_port()), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class AppServer:
+    """The app under gunicorn in a subprocess, with its own state files."""
+
+    def __init__(self, args: argparse.Namespace, turnstile_url: str):
+        self.state = tempfile.TemporaryDirectory()
+        self.url = f"http://127.0.0.1:{_free_port()}"
+        env = {
+            **os.environ,
+            'GUNICORN_BIND': self.url[len('http://'):],
+            'GUNICORN_WORKERS': str(args.workers),
+            'GUNICORN_THREADS': str(args.threads),
+            'DRAW_STORE_PATH': os.path.join(self.state.name, 'draws.db'),
+            'SHARED_STATE_PATH': os.path.join(self.state.name, 'shared.db'),
+            'TURNSTILE_SECRET_KEY': 'load-test',
+            'TURNSTILE_VERIFY_URL': turnstile_url,
+            'EMAIL_BACKEND': 'fake',
+            'FAKE_PROVIDER_URL': '',
+            'FAKE_LATENCY': str(args.email_latency),
+            'FAKE_ERROR_RATE': str(args.email_error_rate),
+            'METRICS_ENABLED': '1',
+            'RATELIMIT_ENABLED': '1' if args.rate_limits else '0',
+        }
+        command = [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py']
+        if args.app == 'asgi':
+            command += ['-k', 'uvicorn.workers.UvicornWorker']
+        self.log_path = os.path.join(self.state.name, 'gunicorn.log')
+        self.log = open(self.log_path, 'w')
+        self.process = subprocess.Popen(command + [f'{args.app}:app'], env=env, stdout=self.log, stderr=subprocess.STDOUT)
+        self.workers = args.workers
+
+    def wait_ready(self, timeout: float = 30) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                break
+            try:
+                if requests.get(f"{self.url}/api/config", timeout=1).status_code == 200:
+                    return
+            except requests.ConnectionError:
+                pass
+            time.sleep(0.1)
+        with open(self.log_path) as f:
+            log = f.read()
+        # Stopping removes the state directory, log included.
+        self.stop()
+        raise RuntimeError(f"App did not start:\n{log}")
+
+    def stop(self) -> None:
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.log.close()
+        self.state.cleanup()
+
+    def __enter__(self) -> 'AppServer':
+        self.wait_ready()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def scrape(self) -> Dict[Tuple[str, Tuple[Tuple[str, str], ...]], List[float]]:
+        """
+        Histogram bucket counts summed over every worker.
+
+        Each scrape is answered by one worker, so /metrics is fetched until
+        every worker's process_info has been seen (or attempts run out).
+        """
+        by_pid: Dict[str, str] = {}
+        for _ in range(self.workers * 20):
+            text = requests.get(f"{self.url}/metrics", timeout=10).text
+            pid = re.search(r'process_info\{pid="(\d+)"\}', text)
+            by_pid[pid.group(1) if pid else ''] = text
+            if len(by_pid) >= self.workers:
+                break
+
+        buckets: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], List[float]] = {}
+        for text in by_pid.values():
+            for line in text.splitlines():
+                match = SAMPLE_PATTERN.match(line)
+                if not match or not match.group(1).endswith('_bucket'):
+                    continue
+                labels = dict(LABEL_PATTERN.findall(match.group(2) or ''))
+                le = labels.pop('le')
+                key = (match.group(1)[len(PREFIX):-len('_bucket')], tuple(sorted(labels.items())))
+                counts = buckets.setdefault(key, [0.0] * (len(LATENCY_BUCKETS) + 1))
+                bounds = [f"{bound:g}" for bound in LATENCY_BUCKETS] + ['+Inf']
+                counts[bounds.index(le)] += float(match.group(3))
+        return buckets
+
+
+def _phases(before: dict, after: dict) -> Dict[str, dict]:
+    """Count, and bucket-bound p50/p95/p99 in ms, of each phase between two scrapes."""
+    phases = {}
+    for phase, (name, wanted) in PHASES.items():
+        cumulative = [0.0] * (len(LATENCY_BUCKETS) + 1)
+        for (metric, labels), counts in after.items():
+            if metric != name or any(dict(labels).get(k) != v for k, v in wanted.items()):
+                continue
+            previous = before.get((metric, labels), [0.0] * len(counts))
+            cumulative = [total + now - then for total, now, then in zip(cumulative, counts, previous)]
+        count = cumulative[-1]
+        if not count:
+            continue
+        summary = {'count': int(count)}
+        for label, fraction in (('p50_ms', 0.5), ('p95_ms', 0.95), ('p99_ms', 0.99)):
+            index = next(i for i, c in enumerate(cumulative) if c >= fraction * count)
+            summary[label] = LATENCY_BUCKETS[index] * 1000 if index < len(LATENCY_BUCKETS) else None
+        phases[phase] = summary
+    return phases
+
+
+def _roster(size: int) -> dict:
+    participants = [{'name': f"person-{i}", 'email': f"person-{i}@example.com"} for i in range(size)]
+    couples = [{'person1': f"person-{i}", 'person2': f"person-{i + 1}"} for i in range(0, size - 1, 6)]
+    return {'participants': participants, 'exclusions': couples, 'message': 'Load test', 'gift_limit': '$20'}
+
+
+def _wait_for_job(session: requests.Session, url: str, timeout: float = 120) -> Optional[str]:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = session.get(url, timeout=10).json().get('status')
+        if status in ('completed', 'failed'):
+            return status
+        time.sleep(0.05)
+    return None
+
+
+def run_level(server: AppServer, target: str, concurrency: int, duration: float, size: int, wait: bool) -> dict:
+    """Closed-loop load: `concurrency` clients sending back-to-back requests for `duration` seconds."""
+    samples: List[Tuple[float, int]] = []
+    completions: List[float] = []
+    job_statuses: Counter = Counter()
+    failures: Counter = Counter()
+    lock = threading.Lock()
+    roster = _roster(size)
+    stop_at = time.monotonic() + duration
+
+    def client() -> None:
+        session = requests.Session()
+        etag = None
+        while time.monotonic() < stop_at:
+            start = time.perf_counter()
+            try:
+                if target == 'page':
+                    headers = {'Accept-Encoding': 'gzip'}
+                    # Alternate first visits with revalidations of the copy already held.
+                    if etag and random.random() < 0.5:
+                        headers['If-None-Match'] = etag
+                    response = session.get(f"{server.url}/", headers=headers, timeout=60)
+                    etag = response.headers.get('ETag', etag)
+                else:
+                    body = {**roster, 'turnstile_token': secrets.token_hex(16)}
+                    response = session.post(f"{server.url}/api/draw", json=body, timeout=60)
+                status = response.status_code
+            except requests.RequestException as e:
+                with lock:
+                    failures[type(e).__name__] += 1
+                continue
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples.append((elapsed, status))
+            if wait and target == 'draw' and status == 202:
+                job_status = _wait_for_job(session, server.url + response.json()['status_url'])
+                with lock:
+                    completions.append(time.perf_counter() - start)
+                    job_statuses[job_status or 'timeout'] += 1
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    before = server.scrape()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    after = server.scrape()
+
+    latencies = [latency for latency, _ in samples]
+    statuses = Counter(status for _, status in samples)
+    ok = sum(count for status, count in statuses.items() if status < 400)
+    errors = sum(count for status, count in statuses.items() if status >= 400 and status != 429) + sum(failures.values())
+    attempted = len(samples) + sum(failures.values())
+    record = {
+        'target': target,
+        'concurrency': concurrency,
+        'roster_size': size if target == 'draw' else None,
+        'elapsed_s': round(elapsed, 3),
+        'requests': len(samples),
+        'throughput_per_s': round(ok / elapsed, 1),
+        'latency_ms': {
+            key: round(percentile(latencies, fraction) * 1000, 1) if latencies else None
+            for key, fraction in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99), ('max', 1.0))
+        },
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'connection_errors': dict(failures),
+        'error_rate': round(errors / attempted, 4) if attempted else None,
+        'rate_limited': statuses.get(429, 0),
+        'phases': _phases(before, after),
+    }
+    if wait and target == 'draw':
+        record['completion_ms'] = {
+            key: round(percentile(completions, fraction) * 1000, 1) if completions else None
+            for key, fraction in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))
+        }
+        record['jobs'] = dict(job_statuses)
+    return record
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Load test the web tier with stubbed Turnstile and email")
+    parser.add_argument('--app', choices=('web', 'asgi'), default='web')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes (default: 2, as startup.sh)')
+    parser.add_argument('--threads', type=int, default=2, help='Threads per worker (default: 2, as startup.sh)')
+    parser.add_argument('--targets', nargs='+', choices=('draw', 'page'), default=['draw', 'page'])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--roster-sizes', type=int, nargs='+', default=[10, 200])
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per level')
+    parser.add_argument('--wait', action='store_true', help='Also time each draw until all its notifications are sent')
+    parser.add_argument('--turnstile-latency', type=float, default=0.05)
+    parser.add_argument('--turnstile-error-rate', type=float, default=0.0)
+    parser.add_argument('--email-latency', type=float, default=0.05)
+    parser.add_argument('--email-error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limits', action='store_true', help='Keep the production rate limits on')
+    parser.add_argument('--output', type=str, default=None, help='Write JSON lines here instead of stdout')
+    args = parser.parse_args(argv)
+
+    turnstile = turnstile_stub(args.turnstile_latency, args.turnstile_error_rate)
+    settings = {
+        'benchmark': 'load',
+        'app': args.app,
+        'workers': args.workers,
+        'threads': args.threads,
+        'turnstile_latency_s': args.turnstile_latency,
+        'turnstile_error_rate': args.turnstile_error_rate,
+        'email_latency_s': args.email_latency,
+        'email_error_rate': args.email_error_rate,
+        'rate_limits': args.rate_limits,
+    }
+    levels = [
+        (target, concurrency, size)
+        for target in args.targets
+        for concurrency in args.concurrency
+        for size in (args.roster_sizes if target == 'draw' else [None])
+    ]
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        for target, concurrency, size in levels:
+            # A fresh server per level, so queued sends and limiter counts don't carry over.
+            with AppServer(args, f"http://127.0.0.1:{turnstile.server_port}/siteverify") as server:
+                record = run_level(server, target, concurrency, args.duration, size or 0, args.wait)
+            out.write(json.dumps({**settings, **record}) + '\n')
+            out.flush()
+    finally:
+        turnstile.shutdown()
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Cold start benchmarks for the web apps and the CLI."""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+# Run in the child interpreter: prints a JSON object of phase timings in seconds.
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module} as target
+imported = time.perf_counter()
+timings = {{'import_s': imported - start}}
+if hasattr(target, 'preload'):
+    target.preload()
+    timings['preload_s'] = time.perf_counter() - imported
+app = getattr(target, 'app', None)
+if app is not None:
+    before = time.perf_counter()
+    client = app.test_client()
+    response = client.get('/')
+    if hasattr(response, '__await__'):
+        import asyncio
+        asyncio.run(response)
+    timings['first_request_s'] = time.perf_counter() - before
+print(json.dumps(timings))
+"""
+
+
+def _run(module: str, env: Dict[str, str], importtime: bool = False) -> Tuple[dict, float, str]:
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', PROBE.format(module=module)]
+    start = time.perf_counter()
+    process = subprocess.run(command, capture_output=True, text=True, env=env, check=True)
+    wall = time.perf_counter() - start
+    return json.loads(process.stdout.strip().splitlines()[-1]), wall, process.stderr
+
+
+def _slowest_imports(importtime_log: str, top: int) -> List[dict]:
+    """The top-level packages with the largest cumulative import time."""
+    totals: Dict[str, int] = {}
+    for line in importtime_log.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        # Nested lines are indented; a package's outermost entry carries its full cost.
+        totals[package] = max(totals.get(package, 0), int(cumulative))
+    slowest = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{'module': name, 'ms': round(us / 1000, 1)} for name, us in slowest]
+
+
+def benchmark(module: str, repeats: int, budget: float, top: int) -> dict:
+    with tempfile.TemporaryDirectory() as state:
+        env = {
+            **os.environ,
+            'DRAW_STORE_PATH': os.path.join(state, 'draws.db'),
+            'SHARED_STATE_PATH': os.path.join(state, 'shared.db'),
+        }
+        runs = [_run(module, env) for _ in range(repeats)]
+        _, _, importtime_log = _run(module, env, importtime=True)
+
+    phases = {key: round(statistics.median(run[0][key] for run in runs), 3) for key in runs[0][0]}
+    process_s = round(statistics.median(run[1] for run in runs), 3)
+    return {
+        'benchmark': 'startup',
+        'target': module,
+        'repeats': repeats,
+        'process_s': process_s,
+        **phases,
+        'slowest_imports': _slowest_imports(importtime_log, top),
+        'budget_s': budget,
+        'within_budget': process_s <= budget,
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark cold start of the web apps and CLI")
+    parser.add_argument('--targets', nargs='+', default=['web', 'asgi', 'main'], help='Modules to import')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=2.0, help='Seconds a fresh process may take to be ready')
+    parser.add_argument('--top', type=int, default=10, help='Slowest imports to list')
+    parser.add_argument('--output', type=str, default=None, help='Write JSON lines here instead of stdout')
+    args = parser.parse_args(argv)
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    over_budget = False
+    try:
+        for target in args.targets:
+            record = benchmark(target, args.repeats, args.budget, args.top)
+            over_budget = over_budget or not record['within_budget']
+            out.write(json.dumps(record) + '\n')
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if over_budget:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,9 @@
+"""Summary statistics shared by the benchmarks."""
+import math
+from typing import List
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """The nearest-rank percentile of `values`, e.g. `fraction=0.95` for p95."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(math.ceil(fraction * len(ordered))) - 1)]
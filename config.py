@@ -1,11 +1,16 @@
 import os
 from dotenv import load_dotenv
-from typing import Optional
+from typing import Dict, Optional, Set
+
+# .env files this process has already loaded. Values never change while it runs, so they are read once.
+_loaded_env_files: Set[Optional[str]] = set()
 
 
 class Config:
     def __init__(self, env_file: Optional[str] = None):
-        load_dotenv(env_file)
+        if env_file not in _loaded_env_files:
+            load_dotenv(env_file)
+            _loaded_env_files.add(env_file)
         self.twilio_account_sid = os.getenv("TWILIO_ACCOUNT_SID")
         self.twilio_auth_token = os.getenv("TWILIO_AUTH_TOKEN")
         self.twilio_from_number = os.getenv("TWILIO_FROM_NUMBER")
@@ -15,6 +20,41 @@ class Config:
         self.azure_sender_email = os.getenv("AZURE_SENDER_EMAIL")
         self.email_template_path = os.getenv("EMAIL_TEMPLATE_PATH")
 
+        self.notification_concurrency = int(os.getenv("NOTIFICATION_CONCURRENCY") or 8)
+        self.sms_rate_limit = self._optional_float("SMS_RATE_LIMIT")
+        # Longest SMS, in billed segments, before falling back to plainer wording; unset sends the full message.
+        self.sms_max_segments = int(os.getenv("SMS_MAX_SEGMENTS")) if os.getenv("SMS_MAX_SEGMENTS") else None
+        self.sms_segment_cost = float(os.getenv("SMS_SEGMENT_COST") or 0.0079)
+        self.email_rate_limit = self._optional_float("EMAIL_RATE_LIMIT")
+        self.draw_store_path = os.getenv("DRAW_STORE_PATH")
+
+        # Which backend serves each channel, and extra backends as "name=module:Class" pairs separated by commas.
+        self.email_backend = os.getenv("EMAIL_BACKEND") or "email"
+        self.sms_backend = os.getenv("SMS_BACKEND") or "sms"
+        self.notification_backends = self._backend_paths("NOTIFICATION_BACKENDS")
+
+        # Local fake provider for load tests: in-process unless FAKE_PROVIDER_URL points at `python fake_service.py`.
+        self.fake_provider_url = os.getenv("FAKE_PROVIDER_URL")
+        self.fake_latency = float(os.getenv("FAKE_LATENCY") or 0.05)
+        self.fake_error_rate = float(os.getenv("FAKE_ERROR_RATE") or 0)
+        self.fake_throttle_rate = self._optional_float("FAKE_THROTTLE_RATE")
+
+    @staticmethod
+    def _optional_float(name: str) -> Optional[float]:
+        value = os.getenv(name)
+        return float(value) if value else None
+
+    @staticmethod
+    def _backend_paths(name: str) -> Dict[str, str]:
+        paths = {}
+        for item in (os.getenv(name) or '').split(','):
+            if item.strip():
+                backend, _, path = item.partition('=')
+                if not path:
+                    raise ValueError(f"{name} entries must look like name=module:Class, got '{item.strip()}'")
+                paths[backend.strip()] = path.strip()
+        return paths
+
     def validate_sms(self) -> None:
         missing = []
         if not self.twilio_account_sid:
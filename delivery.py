@@ -0,0 +1,288 @@
+import asyncio
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import metrics
+
+PERMANENT = 'permanent'
+TRANSIENT = 'transient'
+THROTTLED = 'throttled'
+
+# Exception class names (anywhere in the MRO) that mean the provider could not be reached,
+# covering requests/urllib3 (used by Twilio) and azure-core without importing either.
+TRANSIENT_ERROR_NAMES = frozenset({
+    'ConnectionError', 'Timeout', 'TimeoutError', 'ServiceRequestError', 'ServiceResponseError',
+    'ProtocolError', 'ReadTimeout', 'ConnectTimeout',
+})
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How often to try a send that failed with one class of error, with full-jitter exponential backoff."""
+    attempts: int
+    base_delay: float = 0.0
+    max_delay: float = 0.0
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+# How often an async caller re-checks a circuit breaker that is running its trial call.
+ASYNC_POLL_INTERVAL = 0.25
+
+
+DEFAULT_POLICIES: Dict[str, RetryPolicy] = {
+    PERMANENT: RetryPolicy(attempts=1),
+    TRANSIENT: RetryPolicy(attempts=4, base_delay=0.5, max_delay=8.0),
+    THROTTLED: RetryPolicy(attempts=6, base_delay=1.0, max_delay=30.0),
+}
+
+
+def classify(error: Exception) -> Tuple[str, Optional[float]]:
+    """
+    Sort a provider error into PERMANENT, TRANSIENT or THROTTLED, with any Retry-After in seconds.
+
+    Works from the HTTP status on the exception (`status` on Twilio errors,
+    `status_code` on Azure and requests errors) so no provider SDK is
+    imported here. Errors without a status are transient if they look like
+    a connection failure and permanent otherwise.
+    """
+    response = getattr(error, 'response', None)
+    status = getattr(error, 'status_code', None) or getattr(error, 'status', None) or getattr(response, 'status_code', None)
+    if not isinstance(status, int):
+        status = None
+
+    retry_after = getattr(error, 'retry_after', None)
+    headers = getattr(response, 'headers', None)
+    if retry_after is None and headers is not None:
+        retry_after = headers.get('Retry-After')
+    try:
+        retry_after = float(retry_after) if retry_after is not None else None
+    except (TypeError, ValueError):
+        retry_after = None
+
+    if status == 429:
+        return THROTTLED, retry_after
+    if status is not None:
+        return (TRANSIENT if status == 408 or status >= 500 else PERMANENT), retry_after
+    if isinstance(error, (ConnectionError, TimeoutError)) or any(
+        cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__
+    ):
+        return TRANSIENT, retry_after
+    return PERMANENT, retry_after
+
+
+class RateLimiter:
+    """Thread-safe token bucket allowing `rate` sends per second with bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        if rate <= 0:
+            raise ValueError("Rate limit must be positive")
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _take(self) -> float:
+        """Take a token if one is available, else return how long to wait for the next."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self) -> None:
+        while True:
+            wait = self._take()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        while True:
+            wait = self._take()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+class CircuitOpenError(RuntimeError):
+    """The provider kept failing, so remaining sends are refused rather than attempted."""
+
+
+class CircuitBreaker:
+    """
+    Pauses every sender when the provider looks down.
+
+    After `failure_threshold` consecutive transient or throttled failures the
+    circuit opens and callers wait `reset_timeout` seconds. One trial call
+    is then let through: success closes the circuit, failure reopens it.
+    After `max_trips` failed trials in a row callers get CircuitOpenError
+    until the next trial is due, so a draw against a dead provider fails
+    fast and can be resumed later instead of hanging.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 15.0, max_trips: int = 3):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_trips = max_trips
+        self.failures = 0
+        self.trips = 0
+        self.open_until = 0.0
+        self.probing = False
+        self.condition = threading.Condition()
+
+    def _admit(self) -> Optional[float]:
+        """None if a call may go ahead now, else how long to wait (infinite while a trial is running)."""
+        if not self.trips:
+            return None
+        wait = self.open_until - time.monotonic()
+        if self.trips >= self.max_trips and wait > 0:
+            raise CircuitOpenError(f"Provider unavailable after {self.trips} failed recoveries")
+        if wait <= 0 and not self.probing:
+            self.probing = True
+            return None
+        return wait if wait > 0 else math.inf
+
+    def before_call(self) -> None:
+        with self.condition:
+            while True:
+                wait = self._admit()
+                if wait is None:
+                    return
+                self.condition.wait(None if wait == math.inf else wait)
+
+    async def before_call_async(self) -> None:
+        while True:
+            with self.condition:
+                wait = self._admit()
+            if wait is None:
+                return
+            await asyncio.sleep(min(wait, ASYNC_POLL_INTERVAL))
+
+    def record_success(self) -> None:
+        with self.condition:
+            self.failures = 0
+            self.trips = 0
+            self.probing = False
+            self.condition.notify_all()
+
+    def record_failure(self) -> None:
+        with self.condition:
+            if self.probing:
+                self.probing = False
+                self._open()
+            elif not self.trips:
+                self.failures += 1
+                if self.failures >= self.failure_threshold:
+                    self._open()
+
+    def _open(self) -> None:
+        self.trips += 1
+        self.open_until = time.monotonic() + self.reset_timeout
+        self.condition.notify_all()
+
+
+class DeliveryPipeline:
+    """
+    Runs provider calls with pacing, retries and a circuit breaker.
+
+    Each attempt waits for the circuit breaker, any provider-requested pause
+    and the rate limiter. Failures are classified and retried under the
+    policy for their class. A throttled response pauses every sender
+    sharing the pipeline, for at least the provider's Retry-After.
+    Attempt latencies and outcomes are recorded in metrics under `provider`.
+    """
+
+    def __init__(
+        self,
+        rate_limiter: Optional[RateLimiter] = None,
+        policies: Optional[Dict[str, RetryPolicy]] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        provider: str = 'notification'
+    ):
+        self.provider = provider
+        self.rate_limiter = rate_limiter
+        self.policies = {**DEFAULT_POLICIES, **(policies or {})}
+        self.breaker = breaker or CircuitBreaker()
+        self.resume_at = 0.0
+        self.lock = threading.Lock()
+
+    def pause(self, seconds: float) -> None:
+        with self.lock:
+            self.resume_at = max(self.resume_at, time.monotonic() + seconds)
+
+    def _pause_remaining(self) -> float:
+        with self.lock:
+            return self.resume_at - time.monotonic()
+
+    def _observe(self, started: float, outcome: str) -> None:
+        if metrics.enabled:
+            metrics.observe('delivery_attempt_seconds', time.perf_counter() - started, provider=self.provider)
+            metrics.inc('delivery_attempts_total', provider=self.provider, outcome=outcome)
+
+    def _retry_delay(self, error: Exception, attempts: Dict[str, int], started: float) -> float:
+        """Record a failed attempt and return how long to back off, or re-raise if it should not be retried."""
+        kind, retry_after = classify(error)
+        self._observe(started, kind)
+        if kind == PERMANENT:
+            # The provider answered, so it is healthy even though this message was refused.
+            self.breaker.record_success()
+            metrics.inc('delivery_failures_total', provider=self.provider, kind=kind)
+            raise error
+        self.breaker.record_failure()
+        attempts[kind] = attempts.get(kind, 0) + 1
+        policy = self.policies[kind]
+        if attempts[kind] >= policy.attempts:
+            metrics.inc('delivery_failures_total', provider=self.provider, kind=kind)
+            raise error
+        metrics.inc('delivery_retries_total', provider=self.provider, kind=kind)
+        delay = policy.delay(attempts[kind])
+        if kind == THROTTLED:
+            self.pause(max(delay, retry_after or 0))
+            return 0.0
+        return delay
+
+    def call(self, send: Callable[..., Any], *args, **kwargs) -> Any:
+        attempts: Dict[str, int] = {}
+        while True:
+            self.breaker.before_call()
+            while (wait := self._pause_remaining()) > 0:
+                time.sleep(wait)
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            started = time.perf_counter()
+            try:
+                result = send(*args, **kwargs)
+            except Exception as e:
+                time.sleep(self._retry_delay(e, attempts, started))
+                continue
+            self._observe(started, 'success')
+            self.breaker.record_success()
+            return result
+
+    async def call_async(self, send: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """`call` for coroutine sends: every wait is awaited, so the event loop is never blocked."""
+        attempts: Dict[str, int] = {}
+        while True:
+            await self.breaker.before_call_async()
+            while (wait := self._pause_remaining()) > 0:
+                await asyncio.sleep(wait)
+            if self.rate_limiter:
+                await self.rate_limiter.acquire_async()
+            started = time.perf_counter()
+            try:
+                result = await send(*args, **kwargs)
+            except Exception as e:
+                await asyncio.sleep(self._retry_delay(e, attempts, started))
+                continue
+            self._observe(started, 'success')
+            self.breaker.record_success()
+            return result
@@ -1,89 +1,827 @@
+import copy
+import math
+import multiprocessing
+import os
 import random
-from typing import List, Optional
-from models import Participant, Couple, DrawResult
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from array import array
+from typing import Callable, Dict, FrozenSet, List, Optional, Sequence, Set, Tuple, Union
+from models import Participant, Couple, ExclusionGroup, Block, DrawAssignment
+from exclusion_index import ExclusionIndex
+import metrics
+import preferences
+
+# A giver/receiver cost function, or an n x n matrix (nested lists or a NumPy array) in participant order.
+Costs = Union[Callable[[Participant, Participant], float], Sequence[Sequence[float]]]
 
 
 class DrawService:
-    def __init__(self, participants: List[Participant], couples: Optional[List[Couple]] = None):
+    # Pure random permutations tried before falling back to matching repair.
+    # Accepting the first valid one is exact rejection sampling, so sparse
+    # draws (the common case) are uniformly random over all valid assignments.
+    # Skipped when the constraints make acceptance too unlikely to pay off.
+    REJECTION_ATTEMPTS = 32
+    # Random receivers probed per giver during the greedy phase.
+    GREEDY_PROBES = 8
+    # Random swap attempts when mixing a repaired draw, as a multiple of
+    # n ln n (what a random-transposition walk needs to mix), with a floor so
+    # small draws (where greedy bias is largest) are mixed thoroughly.
+    MIX_ROUNDS = 1
+    MIN_MIX_ATTEMPTS = 1000
+    # Smallest shard worth a process of its own in a parallel draw, and how
+    # many random choices of givers to try when stitching shards together.
+    MIN_SHARD_SIZE = 5000
+    STITCH_ATTEMPTS = 100
+    # Single-cycle search: relocation steps allowed per participant (with a
+    # floor for small rosters), insertion points probed per step, and the
+    # chance of accepting a move that adds conflicts, to escape local minima.
+    # Above DENSE_CONFLICTS expected conflicts per person, the search starts
+    # from group-interleaved positions instead of a shuffle.
+    CYCLE_SEARCH_ROUNDS = 50
+    MIN_CYCLE_STEPS = 20000
+    CYCLE_PROBES = 8
+    CYCLE_NOISE = 0.02
+    DENSE_CONFLICTS = 0.1
+    # Incremental re-draws reopen at most this many assignments before drawing from scratch.
+    REDRAW_LIMIT = 128
+    # Best draws solve over a dense cost matrix, so memory and time grow with
+    # the square (and worse) of the roster: about 1.2GB and 13s at 8,000 people.
+    # Costs closer than COST_RESOLUTION over a whole draw count as ties, broken at random.
+    BEST_MAX_PARTICIPANTS = 10000
+    COST_RESOLUTION = 1.0
+
+    MODES = ('random', 'single_cycle', 'best')
+
+    def __init__(
+        self,
+        participants: List[Participant],
+        couples: Optional[List[Couple]] = None,
+        groups: Optional[List[ExclusionGroup]] = None,
+        blocks: Optional[List[Block]] = None,
+        mode: str = 'random',
+        costs: Optional[Costs] = None
+    ):
         self.participants = participants
         self.couples = couples or []
+        self.groups = groups or []
+        self.blocks = blocks or []
+        self.mode = mode
+        # Pairing costs for best mode; None means every valid pair costs the same.
+        self.costs = costs
         self._validate_inputs()
+        self.index = ExclusionIndex(self.participants, self.couples, self.groups, self.blocks)
+        # Counters from the most recent draw, for benchmarks and diagnostics.
+        self.stats = {}
+
+    @classmethod
+    def from_index(cls, index: ExclusionIndex, mode: str = 'random') -> 'DrawService':
+        """A service over an already built (and validated) index, as used for one shard of a parallel draw."""
+        service = cls.__new__(cls)
+        service.participants = index.participants
+        service.couples, service.groups, service.blocks = [], [], []
+        service.mode = mode
+        service.costs = None
+        service.index = index
+        service.stats = {}
+        return service
+
+    def clone(self) -> 'DrawService':
+        """A service sharing this one's read-only index and costs, with stats of its own, so threads can draw at once."""
+        service = copy.copy(self)
+        service.stats = {}
+        return service
 
     def _validate_inputs(self):
         if len(self.participants) < 2:
             raise ValueError("Need at least 2 participants for Secret Santa")
-        
+        if self.mode not in self.MODES:
+            raise ValueError(f"Unknown draw mode '{self.mode}': expected one of {', '.join(self.MODES)}")
+        if self.mode == 'best' and len(self.participants) > self.BEST_MAX_PARTICIPANTS:
+            raise ValueError(f"Best draws are limited to {self.BEST_MAX_PARTICIPANTS} participants")
+
         all_participants = set(self.participants)
         for couple in self.couples:
             if couple.person1 not in all_participants:
                 raise ValueError(f"Couple member {couple.person1.name} not in participants list")
             if couple.person2 not in all_participants:
                 raise ValueError(f"Couple member {couple.person2.name} not in participants list")
+        for group in self.groups:
+            for member in group.members:
+                if member not in all_participants:
+                    raise ValueError(f"Group member {member.name} not in participants list")
+        for block in self.blocks:
+            for person in (block.giver, block.receiver):
+                if person not in all_participants:
+                    raise ValueError(f"Blocked participant {person.name} not in participants list")
 
     def _is_valid_draw(self, giver: Participant, receiver: Participant) -> bool:
-        if giver == receiver:
+        return self.index.allows(self.index.id_of(giver), self.index.id_of(receiver))
+
+    def draw(self, workers: int = 1) -> DrawAssignment:
+        """
+        Draw a valid assignment. With `workers` > 1, large rosters are drawn as
+        independent shards on that many processes and stitched together.
+        In single_cycle mode the assignment is one gift chain through everyone.
+        In best mode it is a lowest-cost valid assignment under `costs`, drawn
+        on one process.
+        """
+        self.stats = {'rejection_attempts': 0, 'greedy_unmatched': 0, 'swaps': 0}
+        with metrics.span('draw', mode=self.mode):
+            receiver_of = self._sharded_draw(workers) if workers > 1 and self.mode != 'best' else None
+            if receiver_of is None and self.mode == 'single_cycle':
+                receiver_of = self._single_cycle()
+            if receiver_of is None and self.mode == 'best':
+                receiver_of = self._best()
+            if receiver_of is None:
+                receiver_of = self._rejection_sample()
+            if receiver_of is None:
+                receiver_of = self._match()
+                self._mix(receiver_of)
+
+        if metrics.enabled:
+            metrics.inc('draws_total', mode=self.mode)
+            metrics.inc('draw_participants_total', len(receiver_of), mode=self.mode)
+            for key in ('rejection_attempts', 'greedy_unmatched', 'swaps', 'cycle_steps'):
+                metrics.inc(f'draw_{key}_total', self.stats.get(key, 0), mode=self.mode)
+        return DrawAssignment(self.participants, array('I', receiver_of))
+
+    def redraw(self, previous: Dict[str, str]) -> Tuple[DrawAssignment, List[int]]:
+        """
+        Draw again after the roster changed, keeping as much of `previous` (giver name to receiver name) as possible.
+
+        Pairs whose giver or receiver has left, or that the constraints now
+        forbid, are dropped, and only the people they leave without a giver
+        or receiver are re-drawn: a dropout's giver takes over the dropout's
+        receiver, and a late joiner is spliced in between a random giver and
+        the person that giver had. If that is impossible, a few random kept
+        pairs are reopened, doubling each time, and past REDRAW_LIMIT the
+        roster is drawn from scratch. Best draws fill the gaps the same way,
+        without consulting `costs`. Returns the assignment and the positions
+        of the givers whose receiver changed.
+        """
+        by_name = {participant.name: i for i, participant in enumerate(self.participants)}
+        n = len(self.index)
+        receiver_of = [-1] * n
+        given = bytearray(n)
+        for giver_name, receiver_name in previous.items():
+            g, r = by_name.get(giver_name), by_name.get(receiver_name)
+            if g is not None and r is not None and not given[r] and self.index.allows(g, r):
+                receiver_of[g] = r
+                given[r] = 1
+
+        self.stats = {'rejection_attempts': 0, 'greedy_unmatched': 0, 'swaps': 0, 'reopened': 0}
+        with metrics.span('redraw', mode=self.mode):
+            if self.mode == 'single_cycle':
+                redrawn = self._redraw_cycle(receiver_of)
+            else:
+                redrawn = self._redraw_matching(receiver_of, given)
+        if redrawn is None:
+            redrawn = list(self.draw().receivers)
+            self.stats['redraw_fallback'] = True
+
+        changed = [
+            g for g in range(n)
+            if previous.get(self.participants[g].name) != self.participants[redrawn[g]].name
+        ]
+        metrics.inc('redraw_changed_total', len(changed), mode=self.mode)
+        return DrawAssignment(self.participants, array('I', redrawn)), changed
+
+    def _redraw_matching(self, receiver_of: List[int], given: bytearray) -> Optional[List[int]]:
+        n = len(receiver_of)
+        open_givers = [g for g in range(n) if receiver_of[g] < 0]
+        free = [r for r in range(n) if not given[r]]
+        kept = [g for g in range(n) if receiver_of[g] >= 0]
+        random.shuffle(kept)
+
+        while open_givers:
+            if len(open_givers) > self.REDRAW_LIMIT:
+                return None
+            matched = self._match_between(open_givers, free)
+            if matched is not None:
+                for g, r in matched.items():
+                    receiver_of[g] = r
+                break
+            if not kept:
+                return None
+            for _ in range(min(len(open_givers), len(kept))):
+                g = kept.pop()
+                open_givers.append(g)
+                free.append(receiver_of[g])
+                receiver_of[g] = -1
+                self.stats['reopened'] += 1
+        return receiver_of
+
+    def _match_between(self, givers: List[int], receivers: List[int]) -> Optional[Dict[int, int]]:
+        """A random perfect matching of a few givers to as many receivers (simple augmenting paths), or None."""
+        allows = self.index.allows
+        receivers = random.sample(receivers, len(receivers))
+        owner: Dict[int, int] = {}
+
+        def augment(g: int, seen: Set[int]) -> bool:
+            for r in receivers:
+                if r not in seen and allows(g, r):
+                    seen.add(r)
+                    if r not in owner or augment(owner[r], seen):
+                        owner[r] = g
+                        return True
             return False
-        
-        for couple in self.couples:
-            if couple.contains(giver) and couple.contains(receiver):
-                return False
-        
-        return True
-
-    def _find_valid_receiver(self, giver: Participant, available_receivers: List[Participant]) -> Optional[Participant]:
-        valid_receivers = [r for r in available_receivers if self._is_valid_draw(giver, r)]
-        if not valid_receivers:
+
+        for g in random.sample(givers, len(givers)):
+            if not augment(g, set()):
+                return None
+        return {g: r for r, g in owner.items()}
+
+    def _redraw_cycle(self, receiver_of: List[int]) -> Optional[List[int]]:
+        """
+        Re-link the kept pairs into one gift chain.
+
+        The kept pairs form paths (and any intact old cycles, which are cut
+        at random links, one per other piece). The pieces are joined end to
+        end in random order and the new links repaired as in a fresh chain.
+        """
+        n = len(receiver_of)
+        has_giver = bytearray(n)
+        for r in receiver_of:
+            if r >= 0:
+                has_giver[r] = 1
+
+        seen = bytearray(n)
+        pieces: List[List[int]] = []
+        for head in range(n):
+            if not has_giver[head]:
+                path = []
+                person = head
+                while person >= 0:
+                    seen[person] = 1
+                    path.append(person)
+                    person = receiver_of[person]
+                pieces.append(path)
+
+        cycles = []
+        for start in range(n):
+            if not seen[start]:
+                cycle = []
+                person = start
+                while not seen[person]:
+                    seen[person] = 1
+                    cycle.append(person)
+                    person = receiver_of[person]
+                cycles.append(cycle)
+        if not pieces and len(cycles) == 1:
+            return receiver_of
+
+        cuts = max(1, len(pieces))
+        for cycle in cycles:
+            # Cutting after positions `ends` splits the cycle into paths that each end at a cut.
+            ends = sorted(random.sample(range(len(cycle)), min(cuts, len(cycle))))
+            for start, end in zip([ends[-1]] + ends[:-1], ends):
+                piece = cycle[start + 1:end + 1] if start < end else cycle[start + 1:] + cycle[:end + 1]
+                pieces.append(piece)
+        if len(pieces) > self.REDRAW_LIMIT:
+            return None
+
+        random.shuffle(pieces)
+        order = [person for piece in pieces for person in piece]
+        next_of = [0] * n
+        prev_of = [0] * n
+        for i, person in enumerate(order):
+            following = order[(i + 1) % n]
+            next_of[person] = following
+            prev_of[following] = person
+        try:
+            self._repair_cycle(next_of, prev_of)
+        except ValueError:
+            return None
+        return next_of
+
+    def _partition(self, shard_count: int) -> List[List[int]]:
+        """
+        Split participants into shards with the same mix of exclusion groups.
+
+        People are grouped by the exact set of groups they belong to and dealt
+        round-robin, so every shard holds its fair share of each household or
+        team. A group then never dominates a shard (which could make the shard
+        undrawable when the whole roster is not), and every shard is a random
+        sample of the roster, so each giver is equally likely to get anyone.
+        """
+        by_signature: Dict[FrozenSet[int], List[int]] = {}
+        for participant in range(len(self.index)):
+            by_signature.setdefault(self.index.groups_of[participant], []).append(participant)
+
+        shards: List[List[int]] = [[] for _ in range(shard_count)]
+        dealt = 0
+        for members in by_signature.values():
+            random.shuffle(members)
+            for member in members:
+                shards[dealt % shard_count].append(member)
+                dealt += 1
+        return shards
+
+    def _sharded_draw(self, workers: int) -> Optional[List[int]]:
+        """
+        Draw each shard in its own process and stitch the results together.
+
+        Each shard is drawn against only the constraints among its own members.
+        Constraints reaching outside the shard cannot be broken there, since no
+        one is assigned outside their shard. Stitching checks them against the
+        full index. Returns None (for an ordinary draw) when the roster is too
+        small to shard, a shard has no valid draw on its own, or single-cycle
+        shards could not be stitched into one chain.
+        """
+        shard_count = min(workers, os.cpu_count() or 1, len(self.index) // self.MIN_SHARD_SIZE)
+        if shard_count < 2:
+            return None
+        shards = self._partition(shard_count)
+
+        # Forked workers inherit the index and cut out their own shard, which is
+        # far cheaper than pickling each shard's index across to them.
+        global _shard_source
+        fork = 'fork' in multiprocessing.get_all_start_methods()
+        _shard_source = (self.index, shards) if fork else None
+        try:
+            with ProcessPoolExecutor(
+                max_workers=shard_count,
+                mp_context=multiprocessing.get_context('fork') if fork else None
+            ) as pool:
+                futures = [
+                    pool.submit(_draw_shard, shard, random.getrandbits(64), self.mode, None if fork else self.index.subset(ids))
+                    for shard, ids in enumerate(shards)
+                ]
+                local_receivers = [future.result() for future in futures]
+        except ValueError:
+            self.stats['shard_fallback'] = True
             return None
-        return random.choice(valid_receivers)
-
-    def draw(self) -> List[DrawResult]:
-        if len(self.participants) == 2 and len(self.couples) > 0:
-            couple = self.couples[0]
-            if couple.contains(self.participants[0]) and couple.contains(self.participants[1]):
-                raise ValueError("Cannot draw with only 2 participants who are a couple")
-        
-        givers = self.participants.copy()
-        receivers = self.participants.copy()
+        finally:
+            _shard_source = None
+
+        receiver_of = [0] * len(self.index)
+        for ids, receivers in zip(shards, local_receivers):
+            for i, giver in enumerate(ids):
+                receiver_of[giver] = ids[receivers[i]]
+        self.stats['shards'] = shard_count
+        stitched = self._stitch(shards, receiver_of)
+        if self.mode == 'single_cycle' and not (stitched and self._is_one_cycle(receiver_of)):
+            # A chain per shard is not a chain: draw the whole roster on this process instead.
+            self.stats['shard_fallback'] = True
+            return None
+        return receiver_of
+
+    def _stitch(self, shards: List[List[int]], receiver_of: List[int]) -> bool:
+        """
+        Join the shards into one draw by rotating receivers between one giver per shard.
+
+        Giver i takes giver i+1's receiver (the last wraps to the first), which
+        merges their separate gift cycles into a single cycle that passes
+        through every shard. With single-cycle shards the result is one chain.
+        Returns False, leaving the shards apart, when no attempt is allowed.
+        """
+        allows = self.index.allows
+        count = len(shards)
+        for _ in range(self.STITCH_ATTEMPTS):
+            givers = [random.choice(ids) for ids in shards]
+            taken = [receiver_of[giver] for giver in givers]
+            if all(allows(giver, taken[(i + 1) % count]) for i, giver in enumerate(givers)):
+                for i, giver in enumerate(givers):
+                    receiver_of[giver] = taken[(i + 1) % count]
+                self.stats['stitched'] = True
+                return True
+        self.stats['stitched'] = False
+        return False
+
+    @staticmethod
+    def _is_one_cycle(receiver_of: List[int]) -> bool:
+        n = len(receiver_of)
+        person, steps = receiver_of[0], 1
+        while person != 0 and steps <= n:
+            person = receiver_of[person]
+            steps += 1
+        return steps == n
+
+    def _rejection_sample(self) -> Optional[List[int]]:
+        n = len(self.index)
+        if math.exp(-self.index.expected_conflicts()) * self.REJECTION_ATTEMPTS < 1:
+            return None
+        allows = self.index.allows
+        receiver_of = list(range(n))
+        for _ in range(self.REJECTION_ATTEMPTS):
+            self.stats['rejection_attempts'] += 1
+            random.shuffle(receiver_of)
+            if all(allows(g, receiver_of[g]) for g in range(n)):
+                return receiver_of
+        return None
+
+    def _match(self) -> List[int]:
+        """
+        Find a perfect giver->receiver matching avoiding forbidden pairs.
+
+        A randomized greedy pass, most constrained givers first, matches almost
+        everyone in O(n); the givers it leaves behind are matched through
+        augmenting paths. The allowed graph is the complement of the (sparse)
+        forbidden graph, so each search walks it via the shrinking set of
+        unvisited receivers, skipping whole groups at once, rather than
+        enumerating O(n^2) edges. If a giver has no augmenting path, no perfect
+        matching exists, so infeasibility is exact rather than a retry budget.
+        """
+        n = len(self.index)
+        allows = self.index.allows
+        forbidden = self.index.forbidden
+        groups_of = self.index.groups_of
+        receiver_of = [-1] * n
+        giver_of = [-1] * n
+
+        receivers = list(range(n))
+        random.shuffle(receivers)
+        pool = _ReceiverPool(receivers, groups_of)
+        givers = list(range(n))
         random.shuffle(givers)
-        
-        results = []
-        available_receivers = receivers.copy()
-        
+        givers.sort(key=self.index.excluded_count, reverse=True)
+
+        unmatched = []
         for giver in givers:
-            receiver = self._find_valid_receiver(giver, available_receivers)
-            
-            if receiver is None:
-                return self._retry_draw()
-            
-            results.append(DrawResult(giver=giver, receiver=receiver))
-            available_receivers.remove(receiver)
-        
-        return results
-
-    def _retry_draw(self, max_attempts: int = 1000) -> List[DrawResult]:
-        for _ in range(max_attempts):
-            try:
-                givers = self.participants.copy()
-                receivers = self.participants.copy()
-                random.shuffle(givers)
-                random.shuffle(receivers)
-                
-                results = []
-                available_receivers = receivers.copy()
-                
-                for giver in givers:
-                    receiver = self._find_valid_receiver(giver, available_receivers)
-                    
-                    if receiver is None:
-                        break
-                    
-                    results.append(DrawResult(giver=giver, receiver=receiver))
-                    available_receivers.remove(receiver)
-                
-                if len(results) == len(self.participants):
-                    return results
-            except Exception:
+            receiver = -1
+            for _ in range(self.GREEDY_PROBES):
+                candidate = pool.sample()
+                if allows(giver, candidate):
+                    receiver = candidate
+                    break
+            else:
+                # Random probes keep hitting excluded receivers (e.g. a large
+                # team): look only in the groups this giver may draw from.
+                receiver = pool.first_allowed(groups_of[giver], forbidden[giver])
+
+            if receiver == -1:
+                unmatched.append(giver)
+                continue
+            receiver_of[giver] = receiver
+            giver_of[receiver] = giver
+            pool.remove(receiver)
+
+        self.stats['greedy_unmatched'] = len(unmatched)
+        for giver in unmatched:
+            if not self._augment(giver, receiver_of, giver_of):
+                raise ValueError(self._infeasible_message(giver, giver_of))
+
+        return receiver_of
+
+    def _search(self, start: int, giver_of: List[int]):
+        """BFS over alternating paths from a free giver. Returns (free receiver or -1, parents, visited givers)."""
+        forbidden = self.index.forbidden
+        groups_of = self.index.groups_of
+        unvisited = list(range(len(giver_of)))
+        random.shuffle(unvisited)
+        # Unvisited receivers bucketed by group membership, so a giver skips
+        # every bucket sharing one of its groups without scanning it.
+        buckets: Dict[FrozenSet[int], List[int]] = {}
+        for receiver in unvisited:
+            buckets.setdefault(groups_of[receiver], []).append(receiver)
+
+        parent = {}
+        visited_givers = [start]
+        queue = deque([start])
+        while queue:
+            giver = queue.popleft()
+            blocked = forbidden[giver]
+            giver_groups = groups_of[giver]
+            for signature in list(buckets):
+                if not giver_groups.isdisjoint(signature):
+                    continue
+                remaining = []
+                for receiver in buckets[signature]:
+                    if receiver in blocked:
+                        remaining.append(receiver)
+                        continue
+                    parent[receiver] = giver
+                    next_giver = giver_of[receiver]
+                    if next_giver == -1:
+                        return receiver, parent, visited_givers
+                    visited_givers.append(next_giver)
+                    queue.append(next_giver)
+                if remaining:
+                    buckets[signature] = remaining
+                else:
+                    del buckets[signature]
+        return -1, parent, visited_givers
+
+    def _augment(self, start: int, receiver_of: List[int], giver_of: List[int]) -> bool:
+        receiver, parent, _ = self._search(start, giver_of)
+        if receiver == -1:
+            return False
+        while True:
+            giver = parent[receiver]
+            previous = receiver_of[giver]
+            receiver_of[giver] = receiver
+            giver_of[receiver] = giver
+            if giver == start:
+                return True
+            receiver = previous
+
+    def _infeasible_message(self, start: int, giver_of: List[int]) -> str:
+        # Hall violation: the givers reachable from `start` can only be matched
+        # to the receivers already taken by the other reachable givers.
+        _, _, stuck = self._search(start, giver_of)
+        names = sorted(self.participants[g].name for g in stuck)
+        shown = ', '.join(names[:10]) + (f" and {len(names) - 10} more" if len(names) > 10 else '')
+        return (
+            f"Cannot generate a valid Secret Santa draw: {len(stuck)} participant(s) "
+            f"({shown}) can only be assigned to {len(stuck) - 1} possible receiver(s)"
+        )
+
+    def _mix(self, receiver_of: List[int]) -> None:
+        """
+        Randomize a matching with valid receiver swaps between random givers.
+
+        The swap proposal is symmetric, so the walk spreads the repaired draw
+        evenly over the valid assignments it can reach.
+        """
+        n = len(receiver_of)
+        forbidden = self.index.forbidden
+        groups_of = self.index.groups_of
+        rand = random.random
+        swaps = 0
+        for _ in range(self._mix_attempts(n)):
+            a = int(rand() * n)
+            b = int(rand() * n)
+            ra = receiver_of[a]
+            rb = receiver_of[b]
+            # Inlined ExclusionIndex.allows for both new pairs; this loop is the hot path.
+            if (
+                rb not in forbidden[a] and ra not in forbidden[b]
+                and groups_of[a].isdisjoint(groups_of[rb]) and groups_of[b].isdisjoint(groups_of[ra])
+            ):
+                receiver_of[a] = rb
+                receiver_of[b] = ra
+                swaps += 1
+        self.stats['swaps'] = swaps
+
+    def _mix_attempts(self, n: int) -> int:
+        return max(int(self.MIX_ROUNDS * n * math.log(n)), self.MIN_MIX_ATTEMPTS)
+
+    def _best(self) -> List[int]:
+        """
+        A lowest-cost valid assignment, as a min-cost perfect matching (scipy's linear_sum_assignment).
+
+        Forbidden pairs cost infinity. Every pair also gets random noise below
+        COST_RESOLUTION / n, less than COST_RESOLUTION over a whole draw, so it
+        only chooses between draws of (nearly) equal cost and repeated draws
+        of the same roster differ.
+        """
+        linear_sum_assignment = preferences.linear_sum_assignment()
+        np = preferences.numpy()
+
+        n = len(self.index)
+        costs = self._cost_matrix(np)
+        weights = np.random.default_rng(random.getrandbits(64)).random((n, n))
+        weights *= self.COST_RESOLUTION / n
+        weights += costs
+        weights[~self._allowed_matrix(np)] = np.inf
+        try:
+            _, receivers = linear_sum_assignment(weights)
+        except ValueError:
+            # No finite-cost assignment: let the matching explain who cannot be placed.
+            self._match()
+            raise ValueError("No valid Secret Santa assignment with finite costs exists")
+        self.stats['cost'] = float(costs[np.arange(n), receivers].sum())
+        return receivers.tolist()
+
+    def _cost_matrix(self, np):
+        n = len(self.index)
+        if self.costs is None:
+            return np.zeros((n, n))
+        if callable(self.costs):
+            # n^2 Python calls: large rosters should pass a matrix, as preferences.roster_costs builds.
+            people = self.participants
+            return np.array([[self.costs(giver, receiver) for receiver in people] for giver in people], dtype=float)
+        costs = np.asarray(self.costs, dtype=float)
+        if costs.shape != (n, n):
+            raise ValueError(f"Cost matrix must be {n} x {n} for {n} participants, got {' x '.join(map(str, costs.shape))}")
+        if np.isnan(costs).any():
+            raise ValueError("Cost matrix contains NaN")
+        return costs
+
+    def _allowed_matrix(self, np):
+        """Boolean n x n matrix of the pairs the index allows."""
+        n = len(self.index)
+        allowed = np.ones((n, n), dtype=bool)
+        for giver, forbidden in enumerate(self.index.forbidden):
+            allowed[giver, list(forbidden)] = False
+        members: Dict[int, List[int]] = defaultdict(list)
+        for person, groups in enumerate(self.index.groups_of):
+            for group in groups:
+                members[group].append(person)
+        for ids in members.values():
+            allowed[np.ix_(ids, ids)] = False
+        return allowed
+
+    def _single_cycle(self) -> List[int]:
+        """
+        One random gift chain through everyone, as receiver ids by giver.
+
+        People are laid out in a random cyclic order, each giving to the next.
+        With sparse constraints a shuffle has only a handful of forbidden links,
+        and each is fixed by moving one person elsewhere in the chain, so this
+        is O(n). When groups make links dense, the chain instead starts from
+        positions that interleave each group with outsiders. Remaining
+        conflicts go to a bounded min-conflicts search, and the finished chain
+        is shuffled with validity-preserving position swaps.
+        """
+        n = len(self.index)
+        dense = self.index.expected_conflicts() > n * self.DENSE_CONFLICTS
+        if dense:
+            # Fail fast, rather than after the whole search, when no draw of any shape exists.
+            self._check_draw_exists()
+        order = self._interleaved_order() if dense else random.sample(range(n), n)
+
+        next_of = [0] * n
+        prev_of = [0] * n
+        for i, person in enumerate(order):
+            following = order[(i + 1) % n]
+            next_of[person] = following
+            prev_of[following] = person
+
+        moved = self._repair_cycle(next_of, prev_of)
+        if moved or dense:
+            self._mix_cycle(next_of, prev_of)
+        return next_of
+
+    def _interleaved_order(self) -> List[int]:
+        """Largest groups first, filling every other position, so no group sits next to itself while it is at most half the roster."""
+        buckets: Dict[FrozenSet[int], List[int]] = {}
+        for person in range(len(self.index)):
+            buckets.setdefault(self.index.groups_of[person], []).append(person)
+        ordered = list(buckets.values())
+        random.shuffle(ordered)
+        ordered.sort(key=lambda members: (bool(self.index.groups_of[members[0]]), len(members)), reverse=True)
+
+        n = len(self.index)
+        slots = list(range(0, n, 2)) + list(range(1, n, 2))
+        order = [0] * n
+        people = (person for members in ordered for person in random.sample(members, len(members)))
+        for slot, person in zip(slots, people):
+            order[slot] = person
+        return order
+
+    def _repair_cycle(self, next_of: List[int], prev_of: List[int]) -> int:
+        """
+        Remove forbidden links by moving people elsewhere in the chain. Returns the number of moves.
+
+        Each step takes a random forbidden link, picks one of its two people and
+        moves them to the best of a few random places. A move changes three
+        links, so it is O(1) with the chain held as next/prev arrays.
+        """
+        n = len(next_of)
+        allows = self.index.allows
+        rand = random.random
+        conflicted = [u for u in range(n) if not allows(u, next_of[u])]
+        is_conflicted = bytearray(n)
+        for u in conflicted:
+            is_conflicted[u] = 1
+        conflicts = len(conflicted)
+
+        steps = moves = 0
+        budget = max(self.MIN_CYCLE_STEPS, self.CYCLE_SEARCH_ROUNDS * n) if n > 2 else 0
+        while conflicts and steps < budget:
+            steps += 1
+            i = int(rand() * len(conflicted))
+            u = conflicted[i]
+            if not is_conflicted[u]:
+                conflicted[i] = conflicted[-1]
+                conflicted.pop()
+                continue
+
+            v = next_of[u] if rand() < 0.5 else u
+            p, q = prev_of[v], next_of[v]
+            removed = (not allows(p, v)) + (not allows(v, q))
+            best, best_delta = -1, 0
+            for _ in range(self.CYCLE_PROBES):
+                a = int(rand() * n)
+                b = next_of[a]
+                if a == v or b == v:
+                    continue
+                delta = (not allows(p, q)) + (not allows(a, v)) + (not allows(v, b)) - removed - (not allows(a, b))
+                if best == -1 or delta < best_delta:
+                    best, best_delta = a, delta
+            if best == -1 or (best_delta > 0 and rand() >= self.CYCLE_NOISE):
                 continue
-        
-        raise RuntimeError("Could not generate valid Secret Santa draw after multiple attempts")
 
+            a = best
+            b = next_of[a]
+            next_of[p] = q
+            prev_of[q] = p
+            next_of[a] = v
+            prev_of[v] = a
+            next_of[v] = b
+            prev_of[b] = v
+            conflicts += best_delta
+            moves += 1
+            for tail in (p, a, v):
+                if allows(tail, next_of[tail]):
+                    is_conflicted[tail] = 0
+                elif not is_conflicted[tail]:
+                    is_conflicted[tail] = 1
+                    conflicted.append(tail)
+
+        self.stats['cycle_steps'] = steps
+        if conflicts:
+            raise ValueError(self._no_cycle_message())
+        return moves
+
+    def _mix_cycle(self, next_of: List[int], prev_of: List[int]) -> None:
+        """Randomize a chain by swapping the positions of random non-adjacent pairs when all four new links are allowed."""
+        n = len(next_of)
+        allows = self.index.allows
+        rand = random.random
+        swaps = 0
+        for _ in range(self._mix_attempts(n) if n > 3 else 0):
+            x = int(rand() * n)
+            y = int(rand() * n)
+            px, nx, py, ny = prev_of[x], next_of[x], prev_of[y], next_of[y]
+            if x == y or y == nx or y == px:
+                continue
+            if allows(px, y) and allows(y, nx) and allows(py, x) and allows(x, ny):
+                next_of[px], prev_of[y], next_of[y], prev_of[nx] = y, px, nx, y
+                next_of[py], prev_of[x], next_of[x], prev_of[ny] = x, py, ny, x
+                swaps += 1
+        self.stats['swaps'] = swaps
+
+    def _check_draw_exists(self) -> None:
+        # A chain is in particular a valid draw, so an ordinary infeasibility report is exact when it applies.
+        try:
+            self._match()
+        except ValueError as e:
+            raise ValueError(str(e).replace("a valid Secret Santa draw", "a single gift chain")) from None
+
+    def _no_cycle_message(self) -> str:
+        try:
+            self._check_draw_exists()
+        except ValueError as e:
+            return str(e)
+        n = len(self.index)
+        tightest = sorted(range(n), key=self.index.excluded_count, reverse=True)[:5]
+        shown = ', '.join(f"{self.participants[g].name} ({max(0, n - self.index.excluded_count(g))} allowed)" for g in tightest)
+        return (
+            f"Could not find a single gift chain through all {n} participants within the search limit. "
+            f"A regular draw is possible; the most constrained participants are {shown}"
+        )
+
+
+class _ReceiverPool:
+    """
+    Unassigned receivers, both as one flat list for uniform sampling and
+    bucketed by group membership, with O(1) removal from each.
+    """
+
+    def __init__(self, receivers: List[int], groups_of: List[FrozenSet[int]]):
+        self.groups_of = groups_of
+        self.flat = list(receivers)
+        self.flat_position = {r: i for i, r in enumerate(self.flat)}
+        self.buckets: Dict[FrozenSet[int], List[int]] = {}
+        self.bucket_position = {}
+        for receiver in receivers:
+            bucket = self.buckets.setdefault(groups_of[receiver], [])
+            self.bucket_position[receiver] = len(bucket)
+            bucket.append(receiver)
+
+    def sample(self) -> int:
+        return self.flat[int(random.random() * len(self.flat))]
+
+    def first_allowed(self, giver_groups: FrozenSet[int], blocked: Set[int]) -> int:
+        signatures = [s for s in self.buckets if giver_groups.isdisjoint(s)]
+        random.shuffle(signatures)
+        for signature in signatures:
+            bucket = self.buckets[signature]
+            offset = int(random.random() * len(bucket))
+            for i in range(len(bucket)):
+                receiver = bucket[(offset + i) % len(bucket)]
+                if receiver not in blocked:
+                    return receiver
+        return -1
+
+    def remove(self, receiver: int) -> None:
+        self._swap_remove(self.flat, self.flat_position, receiver)
+        signature = self.groups_of[receiver]
+        bucket = self.buckets[signature]
+        self._swap_remove(bucket, self.bucket_position, receiver)
+        if not bucket:
+            del self.buckets[signature]
+
+    @staticmethod
+    def _swap_remove(items: List[int], position: dict, item: int) -> None:
+        index = position.pop(item)
+        last = items.pop()
+        if last != item:
+            items[index] = last
+            position[last] = index
+
+
+# The index and shards of the parallel draw in progress, inherited by forked workers.
+_shard_source: Optional[Tuple[ExclusionIndex, List[List[int]]]] = None
+
+
+def _draw_shard(shard: int, seed: int, mode: str, index: Optional[ExclusionIndex] = None) -> array:
+    """Process pool entry point: draw one shard, returning receivers by local position."""
+    if index is None:
+        source, shards = _shard_source
+        index = source.subset(shards[shard])
+    random.seed(seed)
+    return DrawService.from_index(index, mode).draw().receivers
@@ -0,0 +1,259 @@
+import hashlib
+import json
+import os
+import secrets
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Callable, List, Optional, Set, Tuple
+from models import DrawResult, DeliveryResult, Participant
+
+# Delivery states that still need a notification sent.
+UNDELIVERED = ('pending', 'failed')
+
+
+class DrawStore:
+    """
+    SQLite (WAL) record of every draw, its assignments and per-recipient delivery state.
+
+    The file is shared by every process on the host, so a draw can be looked
+    up, or its undelivered notifications resumed, by a different process
+    (or after a crash) than the one that made it. A notification counts as
+    delivered only once its outcome is recorded, so resuming may re-send a
+    message that was in flight when the process died, but never one that
+    was confirmed sent.
+
+    It also holds named events: a stored roster, bumped to a new version on
+    every change, and the event's latest draw.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(tempfile.gettempdir(), 'secret_santa_draws.db')
+        self._local = threading.local()
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS draws ("
+                "id TEXT PRIMARY KEY, idempotency_key TEXT UNIQUE, channel TEXT NOT NULL, "
+                "options TEXT NOT NULL, status TEXT NOT NULL, error TEXT, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS assignments ("
+                "draw_id TEXT NOT NULL, position INTEGER NOT NULL, "
+                "giver_name TEXT NOT NULL, giver_email TEXT, giver_phone TEXT, receiver_name TEXT NOT NULL, "
+                "status TEXT NOT NULL, reason TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (draw_id, position))"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS events ("
+                "id TEXT PRIMARY KEY, roster TEXT NOT NULL, version INTEGER NOT NULL, draw_id TEXT, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL, owner_hash TEXT)"
+            )
+            if 'owner_hash' not in {row[1] for row in db.execute("PRAGMA table_info(events)")}:
+                # Events stored before owner tokens have none, so they can no longer be changed.
+                db.execute("ALTER TABLE events ADD COLUMN owner_hash TEXT")
+
+    def _connect(self) -> sqlite3.Connection:
+        """This thread's connection, used as `with self._connect() as db:` for one transaction. Kept open as in shared_store._connect."""
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30)
+            # Safe with WAL: a power cut can only lose the latest records, which a resume then re-sends.
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def close(self) -> None:
+        """Close this thread's connection, e.g. in a server's master process before it forks workers."""
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+    def find(self, idempotency_key: str) -> Optional[str]:
+        with self._connect() as db:
+            row = db.execute("SELECT id FROM draws WHERE idempotency_key = ?", (idempotency_key,)).fetchone()
+        return row[0] if row else None
+
+    def create(
+        self,
+        results: List[DrawResult],
+        channel: str,
+        options: Optional[dict] = None,
+        idempotency_key: Optional[str] = None,
+        notify: Optional[List[int]] = None
+    ) -> Tuple[str, bool]:
+        """
+        Save a draw. Returns (draw_id, created); an existing idempotency key returns the earlier draw instead.
+
+        With `notify`, only those positions are pending; the rest are stored
+        as 'unchanged' from an earlier draw and are never sent.
+        """
+        draw_id = secrets.token_urlsafe(16)
+        now = time.time()
+        pending: Optional[Set[int]] = set(notify) if notify is not None else None
+        try:
+            with self._connect() as db:
+                db.execute(
+                    "INSERT INTO draws VALUES (?, ?, ?, ?, 'queued', NULL, ?, ?)",
+                    (draw_id, idempotency_key, channel, json.dumps(options or {}), now, now)
+                )
+                db.executemany(
+                    "INSERT INTO assignments VALUES (?, ?, ?, ?, ?, ?, ?, NULL, 0)",
+                    [
+                        (
+                            draw_id, i, r.giver.name, r.giver.email, r.giver.phone_number, r.receiver.name,
+                            'pending' if pending is None or i in pending else 'unchanged'
+                        )
+                        for i, r in enumerate(results)
+                    ]
+                )
+        except sqlite3.IntegrityError:
+            existing = self.find(idempotency_key) if idempotency_key else None
+            if existing is None:
+                raise
+            return existing, False
+        return draw_id, True
+
+    def set_status(self, draw_id: str, status: str, error: Optional[str] = None) -> None:
+        with self._connect() as db:
+            db.execute("UPDATE draws SET status = ?, error = ?, updated_at = ? WHERE id = ?", (status, error, time.time(), draw_id))
+
+    def record(self, draw_id: str, position: int, delivery: DeliveryResult) -> None:
+        with self._connect() as db:
+            db.execute(
+                "UPDATE assignments SET status = ?, reason = ?, attempts = attempts + 1 WHERE draw_id = ? AND position = ?",
+                (delivery.status, delivery.reason, draw_id, position)
+            )
+            db.execute("UPDATE draws SET updated_at = ? WHERE id = ?", (time.time(), draw_id))
+
+    def options(self, draw_id: str) -> Optional[Tuple[str, dict]]:
+        """The channel and send options a draw was made with, or None if unknown."""
+        with self._connect() as db:
+            row = db.execute("SELECT channel, options FROM draws WHERE id = ?", (draw_id,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def claim(self, draw_id: str, stale_after: Optional[float] = None) -> bool:
+        """
+        Mark a draw queued for resuming, returning whether this caller won it.
+
+        With `stale_after`, only a failed draw, or a queued or running one
+        with no recorded progress for that many seconds, can be claimed.
+        """
+        now = time.time()
+        query = "UPDATE draws SET status = 'queued', error = NULL, updated_at = ? WHERE id = ?"
+        params: tuple = (now, draw_id)
+        if stale_after is not None:
+            query += " AND (status = 'failed' OR (status IN ('queued', 'running') AND updated_at < ?))"
+            params += (now - stale_after,)
+        with self._connect() as db:
+            return db.execute(query, params).rowcount == 1
+
+    def undelivered(self, draw_id: str) -> Tuple[List[DrawResult], List[int]]:
+        """Assignments whose notification is still pending or failed, with their positions in the draw."""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT position, giver_name, giver_email, giver_phone, receiver_name FROM assignments "
+                f"WHERE draw_id = ? AND status IN ({', '.join('?' * len(UNDELIVERED))}) ORDER BY position",
+                (draw_id, *UNDELIVERED)
+            ).fetchall()
+        results = [
+            DrawResult(
+                giver=Participant(name=giver_name, email=giver_email, phone_number=giver_phone),
+                receiver=Participant(name=receiver_name)
+            )
+            for _, giver_name, giver_email, giver_phone, receiver_name in rows
+        ]
+        return results, [row[0] for row in rows]
+
+    def assignments(self, draw_id: str) -> List[Tuple[str, Optional[str], Optional[str], str, str]]:
+        """Every (giver_name, giver_email, giver_phone, receiver_name, status) of a draw, in order."""
+        with self._connect() as db:
+            return db.execute(
+                "SELECT giver_name, giver_email, giver_phone, receiver_name, status FROM assignments "
+                "WHERE draw_id = ? ORDER BY position",
+                (draw_id,)
+            ).fetchall()
+
+    def create_event(self, roster: dict) -> Tuple[str, str]:
+        """Store a new event, returning its id and the owner token that changes it. Only a hash of the token is kept."""
+        event_id = secrets.token_urlsafe(16)
+        owner_token = secrets.token_urlsafe(24)
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO events (id, roster, version, draw_id, created_at, updated_at, owner_hash) VALUES (?, ?, 1, NULL, ?, ?, ?)",
+                (event_id, json.dumps(roster), now, now, _token_hash(owner_token))
+            )
+        return event_id, owner_token
+
+    def is_event_owner(self, event_id: str, owner_token: str) -> bool:
+        with self._connect() as db:
+            row = db.execute("SELECT owner_hash FROM events WHERE id = ?", (event_id,)).fetchone()
+        return bool(row and row[0] and secrets.compare_digest(row[0], _token_hash(owner_token)))
+
+    def event(self, event_id: str) -> Optional[Tuple[int, Optional[str]]]:
+        """An event's (version, latest draw_id), or None if unknown."""
+        with self._connect() as db:
+            return db.execute("SELECT version, draw_id FROM events WHERE id = ?", (event_id,)).fetchone()
+
+    def event_roster(self, event_id: str) -> Optional[Tuple[int, dict]]:
+        with self._connect() as db:
+            row = db.execute("SELECT version, roster FROM events WHERE id = ?", (event_id,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def update_event(self, event_id: str, change: Callable[[dict], dict]) -> Optional[Tuple[int, dict]]:
+        """
+        Replace an event's roster with `change(roster)` as a new version, returning (version, roster).
+
+        `change` may validate a large roster, so it runs outside any
+        transaction. The write only applies if the event is still at the
+        version `change` saw; otherwise `change` is re-applied to the newer
+        roster, so concurrent changes are applied one after the other instead
+        of overwriting each other.
+        """
+        while True:
+            current = self.event_roster(event_id)
+            if current is None:
+                return None
+            version, roster = current
+            roster = change(roster)
+            with self._connect() as db:
+                written = db.execute(
+                    "UPDATE events SET roster = ?, version = ?, updated_at = ? WHERE id = ? AND version = ?",
+                    (json.dumps(roster), version + 1, time.time(), event_id, version)
+                ).rowcount
+            if written:
+                return version + 1, roster
+
+    def set_event_draw(self, event_id: str, draw_id: str) -> None:
+        with self._connect() as db:
+            db.execute("UPDATE events SET draw_id = ?, updated_at = ? WHERE id = ?", (draw_id, time.time(), event_id))
+
+    def get(self, draw_id: str) -> Optional[dict]:
+        with self._connect() as db:
+            draw = db.execute("SELECT status, error FROM draws WHERE id = ?", (draw_id,)).fetchone()
+            if draw is None:
+                return None
+            rows = db.execute(
+                "SELECT giver_name, receiver_name, status, reason FROM assignments WHERE draw_id = ? ORDER BY position",
+                (draw_id,)
+            ).fetchall()
+
+        results = [DeliveryResult(*row).to_dict() for row in rows]
+        counts = {status: 0 for status in ('pending', 'sent', 'failed', 'skipped')}
+        for result in results:
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+
+        status, error = draw
+        summary = {'job_id': draw_id, 'status': status, 'total': len(results), **counts, 'results': results}
+        if error:
+            summary['error'] = error
+        return summary
+
+
+def _token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
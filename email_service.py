@@ -1,70 +1,259 @@
-from typing import List, Optional
-from models import DrawResult
+import asyncio
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from models import DrawResult, DeliveryResult, Participant
 from notification_service import NotificationService
-from template_loader import TemplateLoader
+from template_loader import TemplateLoader, compile_template
+import metrics
 
 
 class AzureEmailService(NotificationService):
+    channel = 'email'
+    address_label = 'email address'
+    # Azure Communication Services' default email quota is 30 per minute.
+    default_rate_limit = 0.5
+    rate_burst = 30
+    POLL_INTERVAL = 0.25
+    POLL_TIMEOUT = 300
+
     def __init__(
         self,
         connection_string: str,
         sender_email: str,
-        template_path: Optional[str] = None
+        template_path: Optional[str] = None,
+        max_concurrency: int = 1,
+        rate_limit: Optional[float] = None
     ):
         try:
             from azure.communication.email import EmailClient
         except ImportError:
             raise ImportError("azure-communication-email package not installed. Run: pip install azure-communication-email")
         
+        super().__init__(max_concurrency, rate_limit)
         self.client = EmailClient.from_connection_string(connection_string)
+        self.connection_string = connection_string
+        self._async_client = None
         self.sender_email = sender_email
         self.template_loader = TemplateLoader(template_path) if template_path else None
 
+    @classmethod
+    def from_config(cls, config) -> 'AzureEmailService':
+        config.validate_email()
+        return cls(
+            connection_string=config.azure_connection_string,
+            sender_email=config.azure_sender_email,
+            template_path=config.email_template_path,
+            max_concurrency=config.notification_concurrency,
+            rate_limit=config.email_rate_limit
+        )
+
+    @classmethod
+    def preload(cls, config) -> None:
+        cls.preload_module('azure.communication.email')
+        if config.email_template_path:
+            compile_template(config.email_template_path)
+
+    def recipient_address(self, participant: Participant) -> Optional[str]:
+        return participant.email
+
     def send_notification(self, recipient: str, recipient_name: str, receiver_name: str, message: str = '', gift_limit: str = '$100') -> bool:
         try:
-            if self.template_loader:
-                html_content = self.template_loader.render(recipient_name, receiver_name, message, gift_limit)
-                plain_text_content = self._generate_plain_text(recipient_name, receiver_name, message, gift_limit)
-            else:
-                html_content = self._generate_default_html(recipient_name, receiver_name, message, gift_limit)
-                plain_text_content = self._generate_plain_text(recipient_name, receiver_name, message, gift_limit)
-
-            email_message = {
-                "senderAddress": self.sender_email,
-                "recipients": {
-                    "to": [{"address": recipient, "displayName": recipient_name}]
-                },
-                "content": {
-                    "subject": f"🎅 Secret Santa Assignment for {recipient_name}!",
-                    "html": html_content,
-                    "plainText": plain_text_content
-                }
-            }
-
-            poller = self.client.begin_send(email_message)
-            poller.wait()
+            self._complete(self.delivery.call(self._submit, recipient, recipient_name, receiver_name, message, gift_limit))
             return True
         except Exception as e:
             print(f"Failed to send email to {recipient}: {e}")
             return False
 
-    def send_draw_results(self, results: List[DrawResult], message: str = '', gift_limit: str = '$100') -> None:
-        for result in results:
-            if not result.giver.email:
-                print(f"✗ Skipping {result.giver.name} - no email address provided")
-                continue
-            
-            success = self.send_notification(
-                result.giver.email,
-                result.giver.name,
-                result.receiver.name,
-                message,
-                gift_limit
-            )
-            if success:
-                print(f"✓ Sent email to {result.giver.name}")
+    def _submit(
+        self,
+        recipient: str,
+        recipient_name: str,
+        receiver_name: str,
+        message: str = '',
+        gift_limit: str = '$100',
+        content: Optional[Tuple[str, str]] = None
+    ) -> Any:
+        return self.client.begin_send(
+            self._build_message(recipient, recipient_name, receiver_name, message, gift_limit, content)
+        )
+
+    def _build_message(
+        self,
+        recipient: str,
+        recipient_name: str,
+        receiver_name: str,
+        message: str = '',
+        gift_limit: str = '$100',
+        content: Optional[Tuple[str, str]] = None
+    ) -> dict:
+        if content:
+            html_content, plain_text_content = content
+        elif self.template_loader:
+            html_content = self.template_loader.render(recipient_name, receiver_name, message, gift_limit)
+            plain_text_content = self._generate_plain_text(recipient_name, receiver_name, message, gift_limit)
+        else:
+            html_content = self._generate_default_html(recipient_name, receiver_name, message, gift_limit)
+            plain_text_content = self._generate_plain_text(recipient_name, receiver_name, message, gift_limit)
+
+        return {
+            "senderAddress": self.sender_email,
+            "recipients": {
+                "to": [{"address": recipient, "displayName": recipient_name}]
+            },
+            "content": {
+                "subject": f"🎅 Secret Santa Assignment for {recipient_name}!",
+                "html": html_content,
+                "plainText": plain_text_content
+            }
+        }
+
+    def _complete(self, poller: Any) -> None:
+        poller.wait()
+        self._check_outcome(poller)
+
+    def _prepare(self, results: List[DrawResult], message: str = '', gift_limit: str = '$100') -> List[dict]:
+        """Render every email in one pass over the compiled template before anything is submitted."""
+        pairs = [(r.giver.name, r.receiver.name) for r in results]
+        with metrics.span('render', template='file' if self.template_loader else 'default'):
+            if self.template_loader:
+                html = self.template_loader.render_many(pairs, message, gift_limit)
+            else:
+                html = [self._generate_default_html(name, receiver_name, message, gift_limit) for name, receiver_name in pairs]
+            return [
+                {'content': (html[i], self._generate_plain_text(name, receiver_name, message, gift_limit))}
+                for i, (name, receiver_name) in enumerate(pairs)
+            ]
+
+    def _complete_many(self, pool: ThreadPoolExecutor, submitted: Dict[Future, int], record: Callable[..., None]) -> None:
+        """
+        Collect pollers as submissions finish and check them all from one loop.
+
+        No worker thread blocks on a poller, so every worker keeps submitting
+        while earlier emails are still being accepted. Emails still pending
+        POLL_TIMEOUT seconds after the last submission are reported failed.
+        """
+        submitting = dict(submitted)
+        pollers: Dict[int, Any] = {}
+        deadline = None
+        while submitting or pollers:
+            for future in [f for f in submitting if f.done()]:
+                i = submitting.pop(future)
+                try:
+                    pollers[i] = future.result()
+                except Exception as e:
+                    record(i, 'failed', str(e))
+
+            for i in [i for i, poller in pollers.items() if poller.done()]:
+                try:
+                    self._check_outcome(pollers.pop(i))
+                    record(i, 'sent')
+                except Exception as e:
+                    record(i, 'failed', str(e))
+
+            if submitting:
+                wait(submitting, timeout=self.POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            elif pollers:
+                deadline = deadline or time.monotonic() + self.POLL_TIMEOUT
+                if time.monotonic() >= deadline:
+                    for i in pollers:
+                        record(i, 'failed', "Timed out waiting for the email to be accepted")
+                    return
+                time.sleep(self.POLL_INTERVAL)
+
+    async def dispatch_async(
+        self,
+        results: List[DrawResult],
+        max_concurrency: Optional[int] = None,
+        on_delivery: Optional[Callable[[int, DeliveryResult], None]] = None,
+        message: str = '',
+        gift_limit: str = '$100'
+    ) -> List[DeliveryResult]:
+        """
+        Send with Azure's asyncio client, so a draw occupies no threads while it waits.
+
+        At most `max_concurrency` submissions are in flight at once. Waiting
+        for the send operation to finish happens outside that limit, so slow
+        operations do not hold up later submissions.
+        """
+        client = await self._get_async_client()
+        prepared = self._prepare(results, message, gift_limit)
+        slots = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+        deliveries: List[Optional[DeliveryResult]] = [None] * len(results)
+
+        def record(i: int, status: str, reason: Optional[str] = None) -> None:
+            deliveries[i] = DeliveryResult(results[i].giver.name, results[i].receiver.name, status, reason)
+            metrics.inc('notifications_total', provider=self.delivery.provider, status=status)
+            if on_delivery:
+                on_delivery(i, deliveries[i])
+
+        async def send(i: int, address: str) -> None:
+            email_message = self._build_message(address, results[i].giver.name, results[i].receiver.name, **prepared[i])
+            try:
+                async with slots:
+                    poller = await self.delivery.call_async(client.begin_send, email_message)
+                self._check_result(await asyncio.wait_for(poller.result(), self.POLL_TIMEOUT))
+            except asyncio.TimeoutError:
+                record(i, 'failed', "Timed out waiting for the email to be accepted")
+            except Exception as e:
+                record(i, 'failed', str(e))
+            else:
+                record(i, 'sent')
+
+        with metrics.span('send', provider=self.delivery.provider):
+            sends = []
+            for i, result in enumerate(results):
+                address = self.recipient_address(result.giver)
+                if address:
+                    sends.append(send(i, address))
+                else:
+                    record(i, 'skipped', f"No {self.address_label}")
+            await asyncio.gather(*sends)
+        return deliveries
+
+    async def _get_async_client(self) -> Any:
+        """Azure's asyncio email client, bound to the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client[0] is not loop:
+            try:
+                from azure.communication.email.aio import EmailClient as AsyncEmailClient
+            except ImportError:
+                raise ImportError("azure-communication-email package not installed. Run: pip install azure-communication-email aiohttp")
+            self._async_client = (loop, AsyncEmailClient.from_connection_string(self.connection_string))
+        return self._async_client[1]
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client[1].close()
+            self._async_client = None
+
+    @classmethod
+    def _check_outcome(cls, poller: Any) -> None:
+        cls._check_result(poller.result())
+
+    @staticmethod
+    def _check_result(outcome: Any) -> None:
+        status = outcome.get('status') if isinstance(outcome, dict) else None
+        if status and status != 'Succeeded':
+            error = outcome.get('error') or {}
+            raise RuntimeError(f"Email {status.lower()}: {error.get('message', 'no details')}")
+
+    def send_draw_results(
+        self,
+        results: List[DrawResult],
+        message: str = '',
+        gift_limit: str = '$100',
+        on_delivery: Optional[Callable[[int, DeliveryResult], None]] = None
+    ) -> List[DeliveryResult]:
+        deliveries = self.dispatch(results, on_delivery=on_delivery, message=message, gift_limit=gift_limit)
+        for delivery in deliveries:
+            if delivery.status == 'sent':
+                print(f"✓ Sent email to {delivery.giver}")
+            elif delivery.status == 'skipped':
+                print(f"✗ Skipping {delivery.giver} - no email address provided")
             else:
-                print(f"✗ Failed to send email to {result.giver.name}")
+                print(f"✗ Failed to send email to {delivery.giver}: {delivery.reason}")
+        return deliveries
 
     def _generate_default_html(self, name: str, receiver_name: str, message: str = '', gift_limit: str = '$100') -> str:
         message_section = f'<div style="background-color: #fff9e6; border-left: 4px solid #ff9800; padding: 15px; margin: 20px 0; border-radius: 4px;"><p style="margin: 0; font-style: italic; color: #333;">{message}</p></div>' if message else ''
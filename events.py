@@ -0,0 +1,159 @@
+"""Named events: rosters stored on the server so they can be drawn, changed and re-drawn by id."""
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+from draw_request import DrawRequestError, build_draw, checked_draw
+from draw_service import DrawService
+from draw_store import DrawStore
+from models import DrawAssignment
+
+EVENT_CACHE_SIZE = 64
+ROSTER_KEYS = (
+    'name', 'participants', 'exclusions', 'couples', 'groups', 'blocks', 'history', 'avoid_repeat_years',
+    'preferences', 'message', 'gift_limit', 'mode',
+)
+# Delivery states meaning the giver already knows their current assignment.
+DELIVERED = ('sent', 'unchanged')
+# Left out of an event shown to anyone but its owner.
+CONTACT_FIELDS = ('email', 'phone_number')
+
+Validated = Tuple[DrawService, dict]
+
+
+class RosterCache:
+    """Per-process LRU of validated, indexed rosters, keyed by event id and version."""
+
+    def __init__(self, maxsize: int = EVENT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: 'OrderedDict[Tuple[str, int], Validated]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, event_id: str, version: int) -> Optional[Validated]:
+        with self._lock:
+            entry = self._entries.get((event_id, version))
+            if entry is not None:
+                self._entries.move_to_end((event_id, version))
+            return entry
+
+    def put(self, event_id: str, version: int, entry: Validated) -> None:
+        with self._lock:
+            self._entries[(event_id, version)] = entry
+            self._entries.move_to_end((event_id, version))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+def event_roster(data: dict) -> dict:
+    """The stored part of a request body. Names identify people between draws, so they must be unique."""
+    roster = {key: data[key] for key in ROSTER_KEYS if key in data}
+    names = [p.get('name') for p in roster.get('participants') or [] if isinstance(p, dict)]
+    if len(set(names)) != len(names):
+        raise DrawRequestError('Participant names must be unique within an event')
+    return roster
+
+
+class Events:
+    def __init__(self, store: DrawStore, cache: Optional[RosterCache] = None):
+        self.store = store
+        self.cache = cache or RosterCache()
+
+    def create(self, data: dict) -> Tuple[str, str]:
+        """Store a new event, returning its id and the owner token needed to change or draw it."""
+        roster = event_roster(data)
+        validated = build_draw(roster)
+        event_id, owner_token = self.store.create_event(roster)
+        self.cache.put(event_id, 1, validated)
+        return event_id, owner_token
+
+    def is_owner(self, event_id: str, owner_token: Optional[str]) -> bool:
+        return bool(owner_token) and self.store.is_event_owner(event_id, owner_token)
+
+    def get(self, event_id: str, owner: bool = False) -> Optional[dict]:
+        """
+        An event's roster and version, or None for an unknown event.
+
+        Unless `owner`, contact details are left out, and so is the latest
+        draw id, whose status shows who drew whom.
+        """
+        event = self.store.event_roster(event_id)
+        if event is None:
+            return None
+        version, roster = event
+        if owner:
+            return {'event_id': event_id, 'version': version, 'draw_id': self.store.event(event_id)[1], 'roster': roster}
+        participants = [
+            {key: value for key, value in p.items() if key not in CONTACT_FIELDS} if isinstance(p, dict) else p
+            for p in roster.get('participants', [])
+        ]
+        return {'event_id': event_id, 'version': version, 'roster': {**roster, 'participants': participants}}
+
+    def replace(self, event_id: str, data: dict) -> Optional[int]:
+        return self._update(event_id, lambda roster: data)
+
+    def add_participant(self, event_id: str, participant: dict) -> Optional[int]:
+        if not isinstance(participant, dict) or not participant.get('name'):
+            raise DrawRequestError('Participant needs a name')
+        return self._update(event_id, lambda roster: {**roster, 'participants': [*roster.get('participants', []), participant]})
+
+    def remove_participant(self, event_id: str, name: str) -> Optional[int]:
+        def remove(roster: dict) -> dict:
+            participants = [p for p in roster.get('participants', []) if p.get('name') != name]
+            if len(participants) == len(roster.get('participants', [])):
+                raise DrawRequestError(f"'{name}' is not in this event")
+            # Constraints naming them are skipped when the roster is resolved.
+            return {**roster, 'participants': participants}
+        return self._update(event_id, remove)
+
+    def _update(self, event_id: str, change: Callable[[dict], dict]) -> Optional[int]:
+        """Apply and validate a change as the event's next version. Returns the version, or None for an unknown event."""
+        validated: List[Validated] = []
+
+        def apply(roster: dict) -> dict:
+            roster = event_roster(change(roster))
+            validated.append(build_draw(roster))
+            return roster
+
+        updated = self.store.update_event(event_id, apply)
+        if updated is None:
+            return None
+        # `apply` runs again if another change landed first; the last run is the one stored.
+        self.cache.put(event_id, updated[0], validated[-1])
+        return updated[0]
+
+    def _validated(self, event_id: str, version: int) -> Validated:
+        entry = self.cache.get(event_id, version)
+        if entry is None:
+            version, roster = self.store.event_roster(event_id)
+            entry = build_draw(roster)
+            self.cache.put(event_id, version, entry)
+        return entry
+
+    def draw(self, event_id: str) -> Optional[Tuple[DrawAssignment, dict, Optional[List[int]]]]:
+        """
+        Draw an event, returning (results, email options, positions to notify), or None for an unknown event.
+
+        The first draw notifies everyone (positions None). Later draws start
+        from the event's previous draw.
+        """
+        event = self.store.event(event_id)
+        if event is None:
+            return None
+        version, draw_id = event
+        cached, options = self._validated(event_id, version)
+        # Cached services are shared between request threads, and a draw records its stats on the service.
+        service = cached.clone()
+        if draw_id is None:
+            return checked_draw(service.draw), options, None
+
+        previous = {giver: (email, phone, receiver, status) for giver, email, phone, receiver, status in self.store.assignments(draw_id)}
+        results, changed = checked_draw(lambda: service.redraw({giver: before[2] for giver, before in previous.items()}))
+        notify = set(changed)
+        for i, participant in enumerate(results.participants):
+            before = previous.get(participant.name)
+            if before is None or before[:2] != (participant.email, participant.phone_number) or before[3] not in DELIVERED:
+                notify.add(i)
+        return results, options, sorted(notify)
+
+    def drawn(self, event_id: str, draw_id: str) -> None:
+        """Record `draw_id` as the event's latest draw, which the next draw starts from."""
+        self.store.set_event_draw(event_id, draw_id)
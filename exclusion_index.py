@@ -0,0 +1,86 @@
+from typing import Dict, FrozenSet, List, Optional, Set
+from models import Participant, Couple, ExclusionGroup, Block
+
+
+_NO_GROUPS: FrozenSet[int] = frozenset()
+
+
+class ExclusionIndex:
+    """
+    Integer-id view of the participants and their forbidden pairs.
+
+    Participants are numbered by their position in the list. Couples and
+    one-directional blocks are compiled into `forbidden[i]`, the set of
+    receiver ids giver `i` must not draw (always including `i` itself).
+    Exclusion groups are stored as group ids per member rather than expanded
+    into pairs, so a household or team costs O(members) to index and two
+    people clash when their group sets intersect.
+    """
+
+    def __init__(
+        self,
+        participants: List[Participant],
+        couples: Optional[List[Couple]] = None,
+        groups: Optional[List[ExclusionGroup]] = None,
+        blocks: Optional[List[Block]] = None
+    ):
+        self.participants = participants
+        self.ids: Dict[Participant, int] = {p: i for i, p in enumerate(participants)}
+        self.forbidden: List[Set[int]] = [{i} for i in range(len(participants))]
+        self.groups_of: List[FrozenSet[int]] = [_NO_GROUPS] * len(participants)
+        self.group_sizes: List[int] = []
+
+        for couple in couples or []:
+            self.exclude_pair(self.id_of(couple.person1), self.id_of(couple.person2))
+        for group_id, group in enumerate(groups or []):
+            self.add_group(group_id, [self.id_of(member) for member in group.members])
+        for block in blocks or []:
+            self.exclude(self.id_of(block.giver), self.id_of(block.receiver))
+
+    def __len__(self) -> int:
+        return len(self.participants)
+
+    def id_of(self, participant: Participant) -> int:
+        try:
+            return self.ids[participant]
+        except KeyError:
+            raise ValueError(f"{participant.name} not in participants list")
+
+    def exclude(self, giver_id: int, receiver_id: int) -> None:
+        self.forbidden[giver_id].add(receiver_id)
+
+    def exclude_pair(self, a: int, b: int) -> None:
+        self.forbidden[a].add(b)
+        self.forbidden[b].add(a)
+
+    def add_group(self, group_id: int, member_ids: List[int]) -> None:
+        self.group_sizes.extend([0] * (group_id + 1 - len(self.group_sizes)))
+        self.group_sizes[group_id] += len(member_ids)
+        for member in member_ids:
+            self.groups_of[member] = self.groups_of[member] | {group_id}
+
+    def excluded_count(self, giver_id: int) -> int:
+        """How many receivers `giver_id` may not draw (an upper bound when groups overlap)."""
+        return len(self.forbidden[giver_id]) + sum(self.group_sizes[g] - 1 for g in self.groups_of[giver_id])
+
+    def expected_conflicts(self) -> float:
+        """Expected number of forbidden pairs in a uniformly random permutation."""
+        return sum(self.excluded_count(i) for i in range(len(self.participants))) / len(self.participants)
+
+    def allows(self, giver_id: int, receiver_id: int) -> bool:
+        return (
+            receiver_id not in self.forbidden[giver_id]
+            and self.groups_of[giver_id].isdisjoint(self.groups_of[receiver_id])
+        )
+
+    def subset(self, ids: List[int]) -> 'ExclusionIndex':
+        """Index over just `ids`, renumbered by position, keeping only the constraints among them."""
+        local = {member: i for i, member in enumerate(ids)}
+        sub = ExclusionIndex([self.participants[member] for member in ids])
+        sub.group_sizes = [0] * len(self.group_sizes)
+        for i, member in enumerate(ids):
+            sub.forbidden[i] = {local[r] for r in self.forbidden[member] if r in local}
+            sub.groups_of[i] = self.groups_of[member]
+            for group_id in sub.groups_of[i]:
+                sub.group_sizes[group_id] += 1
+        return sub
@@ -0,0 +1,202 @@
+"""Local fake notification provider, for load tests and benchmarks on a machine with no network."""
+import argparse
+import json
+import math
+import random
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Optional
+from models import DrawResult, DeliveryResult, Participant
+from notification_service import NotificationService
+
+
+class FakeProviderError(RuntimeError):
+    """A refused send, with the HTTP status and Retry-After that delivery.classify reads."""
+
+    def __init__(self, status_code: int, message: str, retry_after: Optional[float] = None):
+        super().__init__(f"{status_code} {message}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class FakeProvider:
+    def __init__(
+        self,
+        latency: float = 0.05,
+        error_rate: float = 0.0,
+        throttle_rate: Optional[float] = None,
+        burst: Optional[int] = None
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.burst = burst or (max(1, int(throttle_rate)) if throttle_rate else 0)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.stats = {'accepted': 0, 'throttled': 0, 'failed': 0}
+
+    def _throttle_wait(self) -> float:
+        """Take a send from the provider's quota, or return how long until one is free."""
+        if not self.throttle_rate:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.throttle_rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.throttle_rate
+
+    def _count(self, outcome: str) -> None:
+        with self.lock:
+            self.stats[outcome] += 1
+
+    def deliver(self, recipient: str, body: str) -> str:
+        """Accept one message, returning its id, or raise FakeProviderError."""
+        wait = self._throttle_wait()
+        if wait > 0:
+            self._count('throttled')
+            raise FakeProviderError(429, "Too many requests", retry_after=wait)
+        time.sleep(random.uniform(0.5, 1.5) * self.latency)
+        if random.random() < self.error_rate:
+            self._count('failed')
+            raise FakeProviderError(503, "Service unavailable")
+        self._count('accepted')
+        return secrets.token_hex(8)
+
+
+class FakeNotificationService(NotificationService):
+    channel = 'fake'
+    address_label = 'email address or phone number'
+
+    def __init__(
+        self,
+        provider: Optional[FakeProvider] = None,
+        url: Optional[str] = None,
+        max_concurrency: int = 1,
+        rate_limit: Optional[float] = None
+    ):
+        super().__init__(max_concurrency, rate_limit)
+        self.provider = provider or FakeProvider()
+        self.url = url.rstrip('/') if url else None
+        self.session = None
+        if self.url:
+            import requests
+            import requests.adapters
+            self.session = requests.Session()
+            self.session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=self.max_concurrency))
+
+    @classmethod
+    def from_config(cls, config) -> 'FakeNotificationService':
+        return cls(
+            FakeProvider(config.fake_latency, config.fake_error_rate, config.fake_throttle_rate),
+            url=config.fake_provider_url,
+            max_concurrency=config.notification_concurrency
+        )
+
+    def recipient_address(self, participant: Participant) -> Optional[str]:
+        return participant.email or participant.phone_number
+
+    def send_notification(self, recipient: str, recipient_name: str, receiver_name: str, **kwargs) -> bool:
+        try:
+            self.delivery.call(self._submit, recipient, recipient_name, receiver_name)
+            return True
+        except Exception as e:
+            print(f"Failed to send fake notification to {recipient}: {e}")
+            return False
+
+    def _submit(self, recipient: str, recipient_name: str, receiver_name: str, **kwargs) -> str:
+        body = f"{recipient_name}, you are buying a gift for {receiver_name}"
+        if self.session is None:
+            return self.provider.deliver(recipient, body)
+        response = self.session.post(f"{self.url}/messages", json={'to': recipient, 'body': body}, timeout=10)
+        if response.status_code >= 400:
+            retry_after = response.headers.get('Retry-After')
+            raise FakeProviderError(response.status_code, response.text, float(retry_after) if retry_after else None)
+        return response.json()['id']
+
+    def send_draw_results(
+        self,
+        results: List[DrawResult],
+        on_delivery: Optional[Callable[[int, DeliveryResult], None]] = None,
+        **kwargs
+    ) -> List[DeliveryResult]:
+        deliveries = self.dispatch(results, on_delivery=on_delivery, **kwargs)
+        for delivery in deliveries:
+            if delivery.status == 'sent':
+                print(f"✓ Sent fake notification to {delivery.giver}")
+            elif delivery.status == 'skipped':
+                print(f"✗ Skipping {delivery.giver} - no email address or phone number provided")
+            else:
+                print(f"✗ Failed to send fake notification to {delivery.giver}: {delivery.reason}")
+        return deliveries
+
+
+def make_server(provider: FakeProvider, host: str = '127.0.0.1', port: int = 8025) -> ThreadingHTTPServer:
+    """HTTP front end for a FakeProvider: POST /messages sends, GET /stats reports counts."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            if self.path != '/messages':
+                return self._reply(404, {'error': 'Not found'})
+            try:
+                message = json.loads(body)
+                recipient = message['to']
+            except (ValueError, KeyError, TypeError):
+                return self._reply(400, {'error': 'Expected a JSON object with "to"'})
+            try:
+                message_id = provider.deliver(recipient, message.get('body', ''))
+            except FakeProviderError as e:
+                return self._reply(e.status_code, {'error': str(e)}, e.retry_after)
+            self._reply(202, {'id': message_id})
+
+        def do_GET(self):
+            if self.path != '/stats':
+                return self._reply(404, {'error': 'Not found'})
+            with provider.lock:
+                self._reply(200, dict(provider.stats))
+
+        def _reply(self, status: int, payload: dict, retry_after: Optional[float] = None) -> None:
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            if retry_after is not None:
+                self.send_header('Retry-After', str(max(1, math.ceil(retry_after))))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Run a local fake notification provider")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--latency', type=float, default=0.05, help='Mean seconds per accepted send (default: 0.05)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of sends failing with 503 (default: 0)')
+    parser.add_argument('--throttle-rate', type=float, default=None, help='Sends per second before answering 429 (default: unlimited)')
+    args = parser.parse_args(argv)
+
+    server = make_server(FakeProvider(args.latency, args.error_rate, args.throttle_rate), args.host, args.port)
+    print(f"Fake provider listening on http://{args.host}:{args.port} (POST /messages, GET /stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+"""Gunicorn settings for the web apps: `gunicorn --config gunicorn.conf.py web:app`, or `-k uvicorn.workers.UvicornWorker asgi:app`."""
+import importlib
+import os
+import time
+
+STARTED = time.perf_counter()
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', 2))
+threads = int(os.getenv('GUNICORN_THREADS', 2))
+timeout = 120
+preload_app = True
+
+STARTUP_BUDGET = float(os.getenv('STARTUP_BUDGET') or 5)
+
+
+def when_ready(server):
+    loaded = time.perf_counter()
+    module = importlib.import_module(server.app.app_uri.split(':')[0])
+    if hasattr(module, 'preload'):
+        module.preload()
+    ready = time.perf_counter()
+
+    elapsed = ready - STARTED
+    report = f"Startup took {elapsed:.3f}s: app import {loaded - STARTED:.3f}s, preload {ready - loaded:.3f}s"
+    if elapsed > STARTUP_BUDGET:
+        server.log.warning(f"{report}, over the {STARTUP_BUDGET:g}s budget")
+    else:
+        server.log.info(report)
+
+
+def post_fork(server, worker):
+    server.log.info(f"Worker {worker.pid} ready {time.perf_counter() - STARTED:.3f}s after master start")
@@ -0,0 +1,166 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Set
+from models import DrawResult
+from notification_service import NotificationService
+from draw_store import DrawStore
+
+
+class JobQueue:
+    """Runs notification jobs on a small in-process worker pool, recording progress in a DrawStore."""
+
+    def __init__(self, store: DrawStore, max_workers: int = 2):
+        self.store = store
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # Created on first use so each worker process gets its own threads.
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='draw-job')
+            return self._executor
+
+    def submit(
+        self,
+        results: List[DrawResult],
+        service: NotificationService,
+        idempotency_key: Optional[str] = None,
+        notify: Optional[List[int]] = None,
+        **kwargs
+    ) -> str:
+        """
+        Store the draw and queue its notifications. A repeated idempotency key returns the earlier draw unsent.
+
+        With `notify`, only the results at those positions are sent.
+        """
+        draw_id, created = self.store.create(results, service.channel, kwargs, idempotency_key, notify)
+        if created:
+            positions = list(range(len(results))) if notify is None else sorted(notify)
+            self._pool().submit(self._run, draw_id, [results[i] for i in positions], positions, service, kwargs)
+        return draw_id
+
+    def resume(self, draw_id: str, service: NotificationService, stale_after: Optional[float] = None) -> bool:
+        """
+        Queue the undelivered notifications of a stored draw.
+
+        With `stale_after`, only a draw that failed or has made no progress
+        for that many seconds is resumed, so one still being sent by another
+        worker is left alone. Returns whether the draw was queued.
+        """
+        draw = self.store.options(draw_id)
+        if draw is None or not self.store.claim(draw_id, stale_after):
+            return False
+        results, positions = self.store.undelivered(draw_id)
+        self._pool().submit(self._run, draw_id, results, positions, service, draw[1])
+        return True
+
+    def _run(
+        self,
+        draw_id: str,
+        results: List[DrawResult],
+        positions: List[int],
+        service: NotificationService,
+        kwargs: dict
+    ) -> None:
+        self.store.set_status(draw_id, 'running')
+        try:
+            service.dispatch(
+                results,
+                on_delivery=lambda i, delivery: self.store.record(draw_id, positions[i], delivery),
+                **kwargs
+            )
+            self.store.set_status(draw_id, 'completed')
+        except Exception as e:
+            self.store.set_status(draw_id, 'failed', str(e))
+
+
+class AsyncJobQueue:
+    """
+    JobQueue for an asyncio server: each draw runs as a task on the event loop.
+
+    Store access runs on a single writer thread, so per-recipient progress
+    is recorded without blocking the loop and in the order it arrives.
+    """
+
+    def __init__(self, store: DrawStore):
+        self.store = store
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='draw-store')
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def _store(self, method, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._writer, method, *args)
+
+    async def submit(
+        self,
+        results: List[DrawResult],
+        service: NotificationService,
+        idempotency_key: Optional[str] = None,
+        notify: Optional[List[int]] = None,
+        **kwargs
+    ) -> str:
+        draw_id, created = await self._store(self.store.create, results, service.channel, kwargs, idempotency_key, notify)
+        if created:
+            positions = list(range(len(results))) if notify is None else sorted(notify)
+            self._spawn(self._run(draw_id, [results[i] for i in positions], positions, service, kwargs))
+        return draw_id
+
+    async def resume(self, draw_id: str, service: NotificationService, stale_after: Optional[float] = None) -> bool:
+        draw = await self._store(self.store.options, draw_id)
+        if draw is None or not await self._store(self.store.claim, draw_id, stale_after):
+            return False
+        results, positions = await self._store(self.store.undelivered, draw_id)
+        self._spawn(self._run(draw_id, results, positions, service, draw[1]))
+        return True
+
+    async def wait(self) -> None:
+        """Wait for every running draw, e.g. before the server shuts down."""
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _spawn(self, job) -> None:
+        # The loop only keeps weak references to tasks, so hold them until they finish.
+        task = asyncio.create_task(job)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(
+        self,
+        draw_id: str,
+        results: List[DrawResult],
+        positions: List[int],
+        service: NotificationService,
+        kwargs: dict
+    ) -> None:
+        await self._store(self.store.set_status, draw_id, 'running')
+        # Called from the loop or, for thread-backed providers, from a worker thread; both may submit to the writer.
+        writes = []
+        try:
+            await service.dispatch_async(
+                results,
+                on_delivery=lambda i, delivery: writes.append(
+                    self._writer.submit(self.store.record, draw_id, positions[i], delivery)
+                ),
+                **kwargs
+            )
+            await asyncio.gather(*(asyncio.wrap_future(write) for write in writes))
+            await self._store(self.store.set_status, draw_id, 'completed')
+        except Exception as e:
+            await self._store(self.store.set_status, draw_id, 'failed', str(e))
+
+
+class ThreadedJobQueue:
+    """JobQueue's blocking interface to an AsyncJobQueue, for handlers running on worker threads beside its event loop."""
+
+    def __init__(self, queue: AsyncJobQueue):
+        self.queue = queue
+        self.store = queue.store
+        # Set to the server's loop once it is running.
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def submit(self, *args, **kwargs) -> str:
+        return asyncio.run_coroutine_threadsafe(self.queue.submit(*args, **kwargs), self.loop).result()
+
+    def resume(self, *args, **kwargs) -> bool:
+        return asyncio.run_coroutine_threadsafe(self.queue.resume(*args, **kwargs), self.loop).result()
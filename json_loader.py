@@ -1,43 +1,409 @@
+import csv
 import json
-from typing import List, Optional
-from models import Participant, Couple
+import os
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+from models import Participant, Couple, ExclusionGroup, Block, PastDraw, Preference, Roster
+
+DEFAULT_AVOID_REPEAT_YEARS = 1
+CHUNK_SIZE = 64 * 1024
+MAX_REPORTED_ERRORS = 50
+
+SECTIONS = ('participants', 'couples', 'exclusions', 'groups', 'blocks', 'history', 'preferences')
+PREFERENCES = ('same', 'different', 'new')
+# Participant fields with a meaning of their own; any others are kept as attributes for preferences.
+PARTICIPANT_FIELDS = ('type', 'name', 'email', 'phone_number', 'groups')
+
+
+class RosterError(ValueError):
+    """Every problem found while loading a roster, reported together."""
+
+    def __init__(self, errors: List[str]):
+        self.errors = errors
+        shown = '\n'.join(f"- {error}" for error in errors[:MAX_REPORTED_ERRORS])
+        more = f"\n- ...and {len(errors) - MAX_REPORTED_ERRORS} more" if len(errors) > MAX_REPORTED_ERRORS else ''
+        super().__init__(f"Found {len(errors)} problem(s) in participants:\n{shown}{more}")
 
 
 def load_participants_from_json(json_path: str) -> tuple[List[Participant], Optional[List[Couple]]]:
-    with open(json_path, 'r') as f:
-        data = json.load(f)
-    
-    participants_data = data.get('participants', [])
-    if not participants_data:
-        raise ValueError("JSON file must contain a 'participants' array")
-    
-    participants = [
-        Participant(
-            name=p['name'],
-            phone_number=p.get('phone_number'),
-            email=p.get('email')
-        )
-        for p in participants_data
-    ]
-    
-    couples_data = data.get('couples', [])
-    couples = None
-    if couples_data:
-        participants_by_name = {p.name: p for p in participants}
+    roster = load_roster_from_json(json_path)
+    return roster.participants, roster.couples or None
+
+
+def load_roster_from_json(json_path: str) -> Roster:
+    return load_roster(json_path, 'json')
+
+
+def load_roster(path: str, file_format: Optional[str] = None) -> Roster:
+    """
+    Stream a roster from JSON, JSON Lines or CSV, chosen by extension unless given.
+
+    Records are parsed and indexed one at a time, so the raw file is never
+    held in memory. Name references in constraints are resolved against the
+    index once the whole file has been read, so they may appear before the
+    people they name. All problems are raised together as a RosterError.
+    """
+    if file_format is None:
+        extension = os.path.splitext(path)[1].lower()
+        file_format = {'.jsonl': 'jsonl', '.ndjson': 'jsonl', '.csv': 'csv'}.get(extension, 'json')
+
+    builder = RosterBuilder()
+    with open(path, 'r', encoding='utf-8', newline='' if file_format == 'csv' else None) as f:
+        if file_format == 'jsonl':
+            records = _iter_jsonl(f, builder)
+        elif file_format == 'csv':
+            records = _iter_csv(f)
+        elif file_format == 'json':
+            records = _StreamingJSONReader(f).sections()
+        else:
+            raise ValueError(f"Unsupported roster format: {file_format}")
+
+        for section, record, where in records:
+            builder.add(section, record, where)
+
+    if not builder.participants and not builder.errors:
+        raise ValueError("Roster file must contain a 'participants' array or participant records")
+    return builder.build()
+
+
+def parse_constraints(data: dict, participants: List[Participant], strict: bool = True) -> Roster:
+    """
+    Resolve the name-based constraints in `data` against `participants`.
+
+    Supported keys are `couples` (or `exclusions`, as sent by the web UI),
+    `groups`, `blocks`, `history` together with `avoid_repeat_years`, and
+    `preferences`, which read extra fields of the `participants` records.
+    With `strict`, a constraint naming an unknown participant is an error;
+    otherwise it is skipped. Past pairings are always skipped when either
+    person is no longer taking part.
+    """
+    builder = RosterBuilder(strict)
+    for participant in participants:
+        builder.add_existing(participant)
+    for record in data.get('participants') or []:
+        if isinstance(record, dict) and record.get('name') in builder.by_name:
+            builder.add_attributes(record)
+    for section in SECTIONS[1:]:
+        for i, record in enumerate(data.get(section) or []):
+            builder.add(section, record, f"{section}[{i}]")
+    if 'avoid_repeat_years' in data:
+        builder.add('avoid_repeat_years', data['avoid_repeat_years'], 'avoid_repeat_years')
+    return builder.build()
+
+
+def history_blocks(history: List[PastDraw], participants_by_name: Dict[str, Participant], years: int) -> List[Block]:
+    """Blocks that stop anyone drawing the same person as in the last `years` draws."""
+    blocks = []
+    recent = sorted(history, key=lambda past: past.year, reverse=True)[:max(years, 0)]
+    for past in recent:
+        for giver_name, receiver_name in past.pairs:
+            giver = participants_by_name.get(giver_name)
+            receiver = participants_by_name.get(receiver_name)
+            if giver and receiver:
+                blocks.append(Block(giver=giver, receiver=receiver))
+    return blocks
+
+
+class RosterBuilder:
+    """
+    Collects roster records one at a time.
+
+    Participants are indexed by name, email and phone number as they arrive,
+    so duplicate detection is linear. Constraints are kept as names until
+    `build`, which resolves them against the index in a single pass.
+    """
+
+    def __init__(self, strict: bool = True):
+        self.strict = strict
+        self.participants: List[Participant] = []
+        self.by_name: Dict[str, Participant] = {}
+        self.errors: List[str] = []
+        self.avoid_repeat_years = DEFAULT_AVOID_REPEAT_YEARS
+        self._emails: Dict[str, str] = {}
+        self._phones: Dict[str, str] = {}
+        self._couples: List[Tuple[str, Any, Any]] = []
+        self._groups: Dict[Any, Tuple[str, List[Any]]] = {}
+        self._blocks: List[Tuple[str, Any, Any]] = []
+        self._history: List[PastDraw] = []
+        self._preferences: List[Preference] = []
+        self._attributes: Dict[str, Dict[str, str]] = {}
+
+    def add(self, section: str, record: Any, where: str) -> None:
+        if section == 'avoid_repeat_years':
+            try:
+                self.avoid_repeat_years = int(record)
+            except (TypeError, ValueError):
+                self.errors.append(f"{where}: avoid_repeat_years must be a whole number")
+            return
+        if section not in SECTIONS:
+            return
+        if not isinstance(record, dict):
+            self.errors.append(f"{where}: expected an object")
+            return
+
+        if section == 'participants':
+            self.add_participant(record, where)
+        elif section in ('couples', 'exclusions'):
+            self._couples.append((where, record.get('person1'), record.get('person2')))
+        elif section == 'groups':
+            members = record.get('members')
+            if not isinstance(members, list):
+                self.errors.append(f"{where}: group must have a 'members' array")
+                return
+            self._group(record.get('name') or where, where)[1].extend(members)
+        elif section == 'blocks':
+            self._blocks.append((where, record.get('giver'), record.get('receiver')))
+        elif section == 'history':
+            try:
+                pairs = [(pair['giver'], pair['receiver']) for pair in record.get('pairs', [])]
+                self._history.append(PastDraw(year=int(record['year']), pairs=pairs))
+            except (KeyError, TypeError, ValueError):
+                self.errors.append(f"{where}: history needs a 'year' and 'pairs' of giver and receiver")
+        elif section == 'preferences':
+            self.add_preference(record, where)
+
+    def add_preference(self, record: dict, where: str) -> None:
+        prefer = record.get('prefer')
+        attribute = record.get('attribute')
+        if prefer not in PREFERENCES:
+            self.errors.append(f"{where}: preference needs 'prefer' set to one of {', '.join(PREFERENCES)}")
+            return
+        if prefer != 'new' and not isinstance(attribute, str):
+            self.errors.append(f"{where}: '{prefer}' preference needs an 'attribute', e.g. \"office\"")
+            return
+        try:
+            weight = float(record.get('weight', 1))
+        except (TypeError, ValueError):
+            self.errors.append(f"{where}: preference weight must be a number")
+            return
+        self._preferences.append(Preference(prefer=prefer, attribute=attribute, weight=weight))
+
+    def add_participant(self, record: dict, where: str) -> None:
+        name = record.get('name')
+        if not name:
+            self.errors.append(f"{where}: participant has no name")
+            return
+        if not isinstance(name, str):
+            self.errors.append(f"{where}: participant name must be a string, got {name!r}")
+            return
+        contact = [field for field in ('email', 'phone_number') if record.get(field) and not isinstance(record[field], str)]
+        if contact:
+            self.errors.append(f"{where}: {' and '.join(contact).replace('_', ' ')} of '{name}' must be a string")
+            return
+        if name in self.by_name:
+            self.errors.append(f"{where}: duplicate participant name '{name}'")
+            return
+
+        email = record.get('email') or None
+        phone_number = record.get('phone_number') or None
+        if email:
+            other = self._emails.setdefault(email.lower(), name)
+            if other != name:
+                self.errors.append(f"{where}: email {email} is used by both '{other}' and '{name}'")
+        if phone_number:
+            other = self._phones.setdefault(phone_number, name)
+            if other != name:
+                self.errors.append(f"{where}: phone number {phone_number} is used by both '{other}' and '{name}'")
+
+        self.add_existing(Participant(name=name, phone_number=phone_number, email=email))
+        self.add_attributes(record)
+
+        groups = record.get('groups') or []
+        if isinstance(groups, str):
+            groups = [g.strip() for g in groups.split(';') if g.strip()]
+        for group_name in groups:
+            self._group(group_name, where)[1].append(name)
+
+    def add_existing(self, participant: Participant) -> None:
+        self.participants.append(participant)
+        self.by_name[participant.name] = participant
+
+    def add_attributes(self, record: dict) -> None:
+        attributes = {
+            key: str(value) for key, value in record.items()
+            if key not in PARTICIPANT_FIELDS and isinstance(value, (str, int, float)) and value != ''
+        }
+        if attributes:
+            self._attributes[record['name']] = attributes
+
+    def _group(self, key: Any, where: str) -> Tuple[str, List[Any]]:
+        if key not in self._groups:
+            self._groups[key] = (where, [])
+        return self._groups[key]
+
+    def _resolve(self, name: Any, role: str, where: str) -> Optional[Participant]:
+        participant = self.by_name.get(name) if isinstance(name, str) else None
+        if participant is None and self.strict:
+            self.errors.append(f"{where}: {role} '{name}' not found in participants")
+        return participant
+
+    def build(self) -> Roster:
         couples = []
-        for couple_data in couples_data:
-            name1 = couple_data.get('person1')
-            name2 = couple_data.get('person2')
-            
-            if name1 not in participants_by_name:
-                raise ValueError(f"Couple member '{name1}' not found in participants")
-            if name2 not in participants_by_name:
-                raise ValueError(f"Couple member '{name2}' not found in participants")
-            
-            couples.append(Couple(
-                person1=participants_by_name[name1],
-                person2=participants_by_name[name2]
-            ))
-    
-    return participants, couples
+        for where, name1, name2 in self._couples:
+            person1 = self._resolve(name1, "Couple member", where)
+            person2 = self._resolve(name2, "Couple member", where)
+            if person1 and person2:
+                couples.append(Couple(person1=person1, person2=person2))
+
+        groups = []
+        for key, (where, names) in self._groups.items():
+            members = [self._resolve(name, "Group member", where) for name in names]
+            members = [m for m in members if m]
+            if len(members) > 1:
+                groups.append(ExclusionGroup(members=members, name=key if key != where else None))
+
+        blocks = []
+        for where, giver_name, receiver_name in self._blocks:
+            giver = self._resolve(giver_name, "Blocked giver", where)
+            receiver = self._resolve(receiver_name, "Blocked receiver", where)
+            if giver and receiver:
+                blocks.append(Block(giver=giver, receiver=receiver))
+        blocks.extend(history_blocks(self._history, self.by_name, self.avoid_repeat_years))
+
+        if self.errors:
+            raise RosterError(self.errors)
+        return Roster(
+            participants=self.participants,
+            couples=couples,
+            groups=groups,
+            blocks=blocks,
+            preferences=self._preferences,
+            attributes=self._attributes,
+            history=self._history
+        )
+
+
+def _iter_jsonl(f: TextIO, builder: RosterBuilder) -> Iterator[Tuple[str, Any, str]]:
+    """One record per line; the section comes from a `type` field or the record's keys."""
+    for line_number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        where = f"line {line_number}"
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            builder.errors.append(f"{where}: invalid JSON ({e.msg})")
+            continue
+        if not isinstance(record, dict):
+            builder.errors.append(f"{where}: expected an object")
+            continue
+        yield _record_section(record), record, where
+
+
+def _record_section(record: dict) -> str:
+    kind = record.get('type')
+    if kind:
+        return {
+            'participant': 'participants', 'couple': 'couples', 'group': 'groups', 'block': 'blocks',
+            'preference': 'preferences',
+        }.get(kind, kind)
+    if 'members' in record:
+        return 'groups'
+    if 'prefer' in record:
+        return 'preferences'
+    if 'person1' in record:
+        return 'couples'
+    if 'year' in record:
+        return 'history'
+    if 'giver' in record:
+        return 'blocks'
+    return 'participants'
+
+
+def _iter_csv(f: TextIO) -> Iterator[Tuple[str, Any, str]]:
+    """Participants only, with columns name, email, phone_number and optional `groups` (separated by ';')."""
+    for row_number, row in enumerate(csv.DictReader(f), 2):
+        yield 'participants', {k.strip(): (v or '').strip() for k, v in row.items() if k}, f"row {row_number}"
+
+
+class _StreamingJSONReader:
+    """
+    Incremental reader for a top-level JSON object.
+
+    Arrays directly under the top-level object are yielded one element at a
+    time as (key, element, location); other values are yielded whole. Only
+    the current element and one chunk of the file are held in memory.
+    """
+
+    def __init__(self, f: TextIO):
+        self.f = f
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        chunk = self.f.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def _expect(self, char: str) -> None:
+        if self._peek() != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self.buffer, self.pos)
+        self.pos += 1
+
+    def _value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof or not self._fill():
+                    raise
+                continue
+            # A value ending exactly at the buffer edge (e.g. a number) may continue in the next chunk.
+            if end == len(self.buffer) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def _end(self) -> None:
+        """Consume the top-level object's closing brace, which must be the last thing in the file."""
+        self._expect('}')
+        if self._peek():
+            raise RosterError(["unexpected data after the roster's closing '}'"])
 
+    def sections(self) -> Iterator[Tuple[str, Any, str]]:
+        self._expect('{')
+        if self._peek() == '}':
+            self._end()
+            return
+        while True:
+            key = self._value()
+            if not isinstance(key, str):
+                raise json.JSONDecodeError("Expecting property name", self.buffer, self.pos)
+            self._expect(':')
+            if self._peek() == '[':
+                self.pos += 1
+                index = 0
+                if self._peek() == ']':
+                    self.pos += 1
+                else:
+                    while True:
+                        yield key, self._value(), f"{key}[{index}]"
+                        index += 1
+                        if self._peek() == ',':
+                            self.pos += 1
+                            continue
+                        self._expect(']')
+                        break
+            else:
+                yield key, self._value(), key
+            if self._peek() == ',':
+                self.pos += 1
+                continue
+            self._end()
+            return
@@ -2,32 +2,73 @@ import argparse
 import json
 import sys
 from typing import List, Optional
-from models import Participant, Couple, DrawResult
-from draw_service import DrawService
+from models import Participant, Couple, ExclusionGroup, Block, DrawResult, DrawAssignment
+from draw_service import DrawService, Costs
 from notification_service import NotificationService
-from config import Config
-from json_loader import load_participants_from_json
+from services import registry
+from json_loader import load_roster
+from preferences import roster_costs
+from draw_store import DrawStore
+import metrics
 
 
 class SecretSantaApp:
-    def __init__(self, notification_service: NotificationService):
+    def __init__(self, notification_service: NotificationService, store: Optional[DrawStore] = None):
         self.notification_service = notification_service
+        self.store = store
 
     def run(
         self,
         participants: List[Participant],
-        couples: Optional[List[Couple]] = None
-    ) -> List[DrawResult]:
-        draw_service = DrawService(participants, couples)
-        results = draw_service.draw()
+        couples: Optional[List[Couple]] = None,
+        groups: Optional[List[ExclusionGroup]] = None,
+        blocks: Optional[List[Block]] = None,
+        workers: int = 1,
+        mode: str = 'random',
+        costs: Optional[Costs] = None
+    ) -> DrawAssignment:
+        draw_service = DrawService(participants, couples, groups, blocks, mode=mode, costs=costs)
+        results = draw_service.draw(workers=workers)
         
         print(f"\n🎄 Secret Santa Draw Complete! 🎄")
         print(f"Drew {len(results)} pairs\n")
         
-        self.notification_service.send_draw_results(results)
+        if self.store is None:
+            self.notification_service.send_draw_results(results)
+            return results
+        
+        draw_id, _ = self.store.create(results, self.notification_service.channel)
+        print(f"Draw saved as {draw_id}")
+        print(f"If sending is interrupted, finish it with: python main.py --resume {draw_id}\n")
+        self._send(draw_id, list(results), list(range(len(results))))
         
         return results
 
+    def resume(self, draw_id: str) -> None:
+        """Send the notifications of a stored draw that were never delivered."""
+        self.store.claim(draw_id)
+        results, positions = self.store.undelivered(draw_id)
+        if not results:
+            print(f"All notifications for draw {draw_id} have already been delivered.")
+            self.store.set_status(draw_id, 'completed')
+            return
+        
+        print(f"Resuming draw {draw_id}: {len(results)} notification(s) left to send\n")
+        self._send(draw_id, results, positions, self.store.options(draw_id)[1])
+
+    def _send(self, draw_id: str, results: List[DrawResult], positions: List[int], options: Optional[dict] = None) -> None:
+        self.store.set_status(draw_id, 'running')
+        try:
+            self.notification_service.send_draw_results(
+                results,
+                on_delivery=lambda i, delivery: self.store.record(draw_id, positions[i], delivery),
+                **(options or {})
+            )
+        except BaseException as e:
+            self.store.set_status(draw_id, 'failed', str(e) or type(e).__name__)
+            raise
+        self.store.set_status(draw_id, 'completed')
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Secret Santa Notification Draw")
@@ -35,19 +76,68 @@ if __name__ == "__main__":
         '--json',
         type=str,
         default='participants.json',
-        help='Path to JSON file with participants and couples (default: participants.json)'
+        help='Path to participants file: JSON with couples, groups, blocks and history, JSON Lines (.jsonl) or CSV (.csv) (default: participants.json)'
     )
+    # Loads .env first, so backends added with NOTIFICATION_BACKENDS are valid choices.
+    config = registry.config()
     parser.add_argument(
         '--method',
         type=str,
-        choices=['sms', 'email'],
+        choices=NotificationService.backend_names(),
         default='sms',
-        help='Notification method: sms or email (default: sms)'
+        help='Notification backend: sms, email, fake (local test provider) or any registered backend (default: sms)'
+    )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=None,
+        help='Number of notifications to send in parallel (default: NOTIFICATION_CONCURRENCY or 8)'
+    )
+    parser.add_argument(
+        '--draw-workers',
+        type=int,
+        default=1,
+        help='Processes to draw very large rosters (thousands of participants) with, in parallel shards (default: 1)'
+    )
+    parser.add_argument(
+        '--mode',
+        type=str,
+        choices=DrawService.MODES,
+        default='random',
+        help='random, single_cycle for one gift chain through everyone, or best for the draw that best fits the roster\'s preferences (default: random)'
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Print a summary of draw, render and send timings and retry counts when finished'
+    )
+    parser.add_argument(
+        '--resume',
+        type=str,
+        default=None,
+        metavar='DRAW_ID',
+        help='Send the undelivered notifications of an earlier draw instead of drawing again'
     )
     args = parser.parse_args()
+    if args.profile:
+        metrics.enable()
+    
+    if args.concurrency:
+        config.notification_concurrency = args.concurrency
+    store = DrawStore(config.draw_store_path)
+    
+    if args.resume:
+        draw = store.options(args.resume)
+        if draw is None:
+            print(f"Error: no saved draw with id '{args.resume}' in {store.path}")
+            sys.exit(1)
+        SecretSantaApp(registry.service(draw[0].lower()), store).resume(args.resume)
+        if args.profile:
+            print(f"\n{metrics.summary()}")
+        sys.exit(0)
     
     try:
-        participants, couples = load_participants_from_json(args.json)
+        roster = load_roster(args.json)
     except FileNotFoundError:
         print(f"Error: JSON file '{args.json}' not found.")
         print(f"Please create a JSON file or copy 'participants.json.example' to 'participants.json'")
@@ -59,26 +149,13 @@ if __name__ == "__main__":
         print(f"Error loading participants: {e}")
         sys.exit(1)
     
-    config = Config()
-    
-    if args.method == 'sms':
-        config.validate_sms()
-        from sms_service import TwilioSMSService
-        notification_service = TwilioSMSService(
-            account_sid=config.twilio_account_sid,
-            auth_token=config.twilio_auth_token,
-            from_number=config.twilio_from_number,
-            from_name=config.twilio_from_name
-        )
-    else:
-        config.validate_email()
-        from email_service import AzureEmailService
-        notification_service = AzureEmailService(
-            connection_string=config.azure_connection_string,
-            sender_email=config.azure_sender_email,
-            template_path=config.email_template_path
-        )
-    
-    app = SecretSantaApp(notification_service)
-    app.run(participants, couples)
+    app = SecretSantaApp(registry.service(args.method), store)
+    app.run(
+        roster.participants, roster.couples, roster.groups, roster.blocks,
+        workers=args.draw_workers,
+        mode=args.mode,
+        costs=roster_costs(roster) if args.mode == 'best' else None
+    )
+    if args.profile:
+        print(f"\n{metrics.summary()}")
 
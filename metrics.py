@@ -0,0 +1,187 @@
+"""In-process timing spans, counters and histograms for the draw and delivery hot paths."""
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+PREFIX = 'secret_santa_'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# While off, every helper returns at once, so instrumented code pays one flag check per call.
+enabled = os.getenv('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    __slots__ = ('counts', 'count', 'sum', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+
+class Metrics:
+    """Counters and histograms keyed by name and a sorted tuple of label pairs."""
+
+    def __init__(self):
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, name: str, value: float, labels: Labels) -> None:
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, labels: Labels) -> None:
+        key = (name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        # Identifies the worker process, so scrapes of several workers can be told apart and combined.
+        lines: List[str] = [f"# TYPE {PREFIX}process_info gauge", f'{PREFIX}process_info{{pid="{os.getpid()}"}} 1']
+        with self.lock:
+            typed = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE {PREFIX}{name} counter")
+                lines.append(f"{PREFIX}{name}{_format(labels)} {value:g}")
+
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE {PREFIX}{name} histogram")
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + (float('inf'),), histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else f"{bound:g}"
+                    lines.append(f"{PREFIX}{name}_bucket{_format(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{PREFIX}{name}_sum{_format(labels)} {histogram.sum:.6f}")
+                lines.append(f"{PREFIX}{name}_count{_format(labels)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> str:
+        """A table of timings and counters for `main.py --profile`."""
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+        if not histograms and not counters:
+            return "No metrics recorded."
+
+        lines = []
+        if histograms:
+            width = max(len(name + _format(labels)) for (name, labels), _ in histograms)
+            lines.append(f"{'timing':<{width}}  {'count':>7}  {'total s':>9}  {'mean ms':>9}  {'max ms':>9}")
+            for (name, labels), h in histograms:
+                lines.append(
+                    f"{name + _format(labels):<{width}}  {h.count:>7}  {h.sum:>9.3f}  "
+                    f"{h.sum / h.count * 1000:>9.2f}  {h.max * 1000:>9.2f}"
+                )
+        if counters:
+            width = max(len(name + _format(labels)) for (name, labels), _ in counters)
+            lines.append('')
+            lines.append(f"{'counter':<{width}}  {'value':>9}")
+            for (name, labels), value in counters:
+                lines.append(f"{name + _format(labels):<{width}}  {value:>9g}")
+        return '\n'.join(lines)
+
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format(labels: Labels) -> str:
+    if not labels:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+_metrics = Metrics()
+
+
+class _Span:
+    __slots__ = ('name', 'labels', 'start')
+
+    def __init__(self, name: str, labels: Labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self) -> '_Span':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        _metrics.observe(f"{self.name}_seconds", time.perf_counter() - self.start, self.labels)
+        if exc_type is not None:
+            _metrics.inc(f"{self.name}_errors_total", 1, self.labels)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def enable() -> None:
+    global enabled
+    enabled = True
+
+
+def span(name: str, **labels):
+    """Time a block into the `<name>_seconds` histogram, counting `<name>_errors_total` if it raises."""
+    if not enabled:
+        return _NULL_SPAN
+    return _Span(name, _labels(labels))
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    if enabled and value:
+        _metrics.inc(name, value, _labels(labels))
+
+
+def observe(name: str, value: float, **labels) -> None:
+    if enabled:
+        _metrics.observe(name, value, _labels(labels))
+
+
+def render() -> str:
+    return _metrics.render()
+
+
+def summary() -> str:
+    return _metrics.summary()
+
+
+def reset() -> None:
+    _metrics.reset()
@@ -1,20 +1,40 @@
-from dataclasses import dataclass
-from typing import List, Optional
+import sys
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union, overload
 
 
-@dataclass
+@dataclass(frozen=True, slots=True, eq=False)
 class Participant:
     name: str
     phone_number: Optional[str] = None
     email: Optional[str] = None
+    _hash: int = field(init=False, repr=False)
+
+    def __post_init__(self):
+        # Names are compared constantly while drawing and resolving constraints,
+        # so intern them and compute the hash once.
+        object.__setattr__(self, 'name', sys.intern(self.name))
+        object.__setattr__(self, '_hash', hash((self.name, self.phone_number, self.email)))
 
     def __hash__(self):
-        return hash((self.name, self.phone_number, self.email))
+        return self._hash
+
+    def __reduce__(self):
+        # String hashes differ between processes, so never pickle the cached hash.
+        return (Participant, (self.name, self.phone_number, self.email))
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if not isinstance(other, Participant):
             return False
-        return self.name == other.name and self.phone_number == other.phone_number and self.email == other.email
+        return (
+            self._hash == other._hash
+            and self.name == other.name
+            and self.phone_number == other.phone_number
+            and self.email == other.email
+        )
 
 
 @dataclass
@@ -33,8 +53,114 @@ class Couple:
         return None
 
 
-@dataclass
+@dataclass(slots=True)
 class DrawResult:
     giver: Participant
     receiver: Participant
 
+
+class DrawAssignment(Sequence[DrawResult]):
+    """
+    A completed draw stored as receiver ids against a shared participant table.
+
+    `receivers[i]` is the index of the person participant `i` buys for. It
+    behaves as a read-only sequence of DrawResult, built lazily on access, so
+    existing callers can iterate it like a list.
+    """
+
+    __slots__ = ('participants', 'receivers')
+
+    def __init__(self, participants: Sequence[Participant], receivers: Union[array, Sequence[int]]):
+        self.participants = tuple(participants)
+        self.receivers = receivers if isinstance(receivers, array) else array('I', receivers)
+        if len(self.receivers) != len(self.participants):
+            raise ValueError("Draw must assign exactly one receiver per participant")
+
+    def __len__(self) -> int:
+        return len(self.receivers)
+
+    @overload
+    def __getitem__(self, index: int) -> DrawResult: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[DrawResult]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return DrawResult(giver=self.participants[index], receiver=self.participants[self.receivers[index]])
+
+    def __iter__(self) -> Iterator[DrawResult]:
+        participants = self.participants
+        for giver, receiver in zip(participants, self.receivers):
+            yield DrawResult(giver=giver, receiver=participants[receiver])
+
+    def pairs(self) -> List[Tuple[str, str]]:
+        """(giver name, receiver name) for every participant."""
+        participants = self.participants
+        return [(giver.name, participants[receiver].name) for giver, receiver in zip(participants, self.receivers)]
+
+
+
+@dataclass
+class ExclusionGroup:
+    """A household or team: no member may draw another member."""
+    members: List[Participant]
+    name: Optional[str] = None
+
+    def contains(self, participant: Participant) -> bool:
+        return participant in self.members
+
+
+@dataclass
+class Block:
+    """One-directional exclusion: `giver` must not draw `receiver`."""
+    giver: Participant
+    receiver: Participant
+
+
+@dataclass
+class PastDraw:
+    """Pairings from a previous year, by giver and receiver name."""
+    year: int
+    pairs: List[Tuple[str, str]]
+
+
+@dataclass
+class Preference:
+    """
+    A soft pairing preference for best draws, adding `weight` to the cost of the pairs it dislikes.
+
+    `prefer` is 'same' (giver and receiver share `attribute`, e.g. office),
+    'different' (they don't, e.g. department) or 'new' (avoid repeating past
+    pairings, weighted towards recent years).
+    """
+    prefer: str
+    attribute: Optional[str] = None
+    weight: float = 1.0
+
+
+@dataclass
+class Roster:
+    participants: List[Participant]
+    couples: List[Couple] = field(default_factory=list)
+    groups: List[ExclusionGroup] = field(default_factory=list)
+    blocks: List[Block] = field(default_factory=list)
+    preferences: List[Preference] = field(default_factory=list)
+    # Extra participant fields (e.g. office, department) by participant name, for preferences.
+    attributes: Dict[str, Dict[str, str]] = field(default_factory=dict)
+    history: List[PastDraw] = field(default_factory=list)
+
+
+@dataclass
+class DeliveryResult:
+    giver: str
+    receiver: str
+    status: str
+    reason: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        result = {'giver': self.giver, 'receiver': self.receiver, 'status': self.status}
+        if self.reason:
+            result['reason'] = self.reason
+        return result
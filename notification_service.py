@@ -1,14 +1,204 @@
+import asyncio
+import importlib
 from abc import ABC, abstractmethod
-from typing import List
-from models import DrawResult
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from importlib.metadata import entry_points
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Type, Union
+from models import DrawResult, DeliveryResult, Participant
+from delivery import DeliveryPipeline, RateLimiter
+import metrics
+
+if TYPE_CHECKING:
+    from config import Config
+
+# Installed packages can add backends under this entry point group, e.g. in pyproject.toml:
+#   [project.entry-points."secret_santa.notification_backends"]
+#   push = "my_package.push:PushService"
+BACKEND_ENTRY_POINT_GROUP = 'secret_santa.notification_backends'
+
+# Built-in backends as "module:Class", imported only when used so their SDKs stay optional.
+BUILTIN_BACKENDS = {
+    'sms': 'sms_service:TwilioSMSService',
+    'email': 'email_service:AzureEmailService',
+    'fake': 'fake_service:FakeNotificationService',
+}
 
 
 class NotificationService(ABC):
+    channel = 'notification'
+    address_label = 'address'
+    # Provider send limit used when no rate limit is configured: messages per second and burst size.
+    default_rate_limit: Optional[float] = None
+    rate_burst: Optional[int] = None
+
+    _backends: Dict[str, Union[str, Type['NotificationService']]] = dict(BUILTIN_BACKENDS)
+    _entry_points_loaded = False
+
+    def __init__(self, max_concurrency: int = 1, rate_limit: Optional[float] = None):
+        self.max_concurrency = max(1, max_concurrency)
+        rate_limit = rate_limit or self.default_rate_limit
+        self.delivery = DeliveryPipeline(
+            RateLimiter(rate_limit, self.rate_burst) if rate_limit else None,
+            provider=self.channel.lower()
+        )
+
+    @classmethod
+    def from_config(cls, config: 'Config') -> 'NotificationService':
+        """Build the service from application settings. Backends used through the registry must implement this."""
+        raise NotImplementedError(f"{cls.__name__} cannot be built from configuration")
+
+    @classmethod
+    def preload(cls, config: 'Config') -> None:
+        """
+        Import SDKs and build immutable state (e.g. compiled templates) ahead of forking worker processes.
+
+        Must not create clients or open connections, which each process builds for itself.
+        """
+
+    @staticmethod
+    def preload_module(name: str) -> None:
+        """Import an SDK module for preload, if installed; a missing one is reported with an install hint when the service is built."""
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+    @classmethod
+    def register_backend(cls, name: str, backend: Union[str, Type['NotificationService']]) -> None:
+        """Make a backend available by name, as a class or a lazily imported "module:Class" path."""
+        cls._backends[name] = backend
+
+    @classmethod
+    def backend_names(cls) -> List[str]:
+        cls._load_entry_points()
+        return sorted(cls._backends)
+
+    @classmethod
+    def backend(cls, name: str) -> Type['NotificationService']:
+        cls._load_entry_points()
+        backend = cls._backends.get(name)
+        if backend is None:
+            raise ValueError(f"Unknown notification backend '{name}': expected one of {', '.join(sorted(cls._backends))}")
+        if isinstance(backend, str):
+            module, _, attribute = backend.partition(':')
+            backend = getattr(importlib.import_module(module), attribute)
+            cls._backends[name] = backend
+        return backend
+
+    @classmethod
+    def _load_entry_points(cls) -> None:
+        if cls._entry_points_loaded:
+            return
+        cls._entry_points_loaded = True
+        found = entry_points()
+        group = found.select(group=BACKEND_ENTRY_POINT_GROUP) if hasattr(found, 'select') else found.get(BACKEND_ENTRY_POINT_GROUP, [])
+        for entry_point in group:
+            # Explicit registrations (built-ins and NOTIFICATION_BACKENDS) win over installed packages.
+            cls._backends.setdefault(entry_point.name, entry_point.value)
+
     @abstractmethod
     def send_notification(self, recipient: str, recipient_name: str, receiver_name: str) -> bool:
         pass
 
     @abstractmethod
-    def send_draw_results(self, results: List[DrawResult]) -> None:
+    def send_draw_results(
+        self,
+        results: List[DrawResult],
+        on_delivery: Optional[Callable[[int, DeliveryResult], None]] = None
+    ) -> List[DeliveryResult]:
+        pass
+
+    @abstractmethod
+    def recipient_address(self, participant: Participant) -> Optional[str]:
         pass
 
+    def _submit(self, recipient: str, recipient_name: str, receiver_name: str, **kwargs) -> Any:
+        """Start sending one notification and return a handle for `_complete`. Raises on failure."""
+        if not self.send_notification(recipient, recipient_name, receiver_name, **kwargs):
+            raise RuntimeError(f"Failed to send {self.channel}")
+
+    def _complete(self, handle: Any) -> None:
+        """Wait for a submitted notification to be accepted. Raises on failure."""
+
+    def _prepare(self, results: List[DrawResult], **kwargs) -> Optional[List[dict]]:
+        """Optionally build every message up front: one dict of extra `_submit` arguments per result."""
+        return None
+
+    def _complete_many(
+        self,
+        pool: ThreadPoolExecutor,
+        submitted: Dict[Future, int],
+        record: Callable[..., None]
+    ) -> None:
+        """Wait for every submission, calling `record(position, status, reason)` as each finishes."""
+        completed = {}
+        for future in as_completed(submitted):
+            i = submitted[future]
+            try:
+                completed[pool.submit(self._complete, future.result())] = i
+            except Exception as e:
+                record(i, 'failed', str(e))
+
+        for future in as_completed(completed):
+            i = completed[future]
+            try:
+                future.result()
+                record(i, 'sent')
+            except Exception as e:
+                record(i, 'failed', str(e))
+
+    def dispatch(
+        self,
+        results: List[DrawResult],
+        max_concurrency: Optional[int] = None,
+        on_delivery: Optional[Callable[[int, DeliveryResult], None]] = None,
+        **kwargs
+    ) -> List[DeliveryResult]:
+        """
+        Send every draw result on a bounded worker pool.
+
+        All submissions are queued before any completion, so providers with
+        long-running sends (e.g. Azure pollers) have every message in flight
+        before the first one is waited on. Submissions go through the service's
+        delivery pipeline, which paces, retries and circuit-breaks them, and
+        the returned list follows the order of `results`.
+        `on_delivery(position, delivery)` is called as each outcome is known.
+        """
+        deliveries: List[Optional[DeliveryResult]] = [None] * len(results)
+        workers = max_concurrency or self.max_concurrency
+
+        prepared = self._prepare(results, **kwargs)
+
+        def submit(i: int, address: str) -> Any:
+            extra = prepared[i] if prepared else {}
+            return self.delivery.call(self._submit, address, results[i].giver.name, results[i].receiver.name, **kwargs, **extra)
+
+        def record(i: int, status: str, reason: Optional[str] = None) -> None:
+            result = results[i]
+            deliveries[i] = DeliveryResult(result.giver.name, result.receiver.name, status, reason)
+            metrics.inc('notifications_total', provider=self.delivery.provider, status=status)
+            if on_delivery:
+                on_delivery(i, deliveries[i])
+
+        with metrics.span('send', provider=self.delivery.provider), ThreadPoolExecutor(max_workers=workers) as pool:
+            submitted = {}
+            for i, result in enumerate(results):
+                address = self.recipient_address(result.giver)
+                if not address:
+                    record(i, 'skipped', f"No {self.address_label}")
+                    continue
+                submitted[pool.submit(submit, i, address)] = i
+
+            self._complete_many(pool, submitted, record)
+
+        return deliveries
+
+    async def dispatch_async(
+        self,
+        results: List[DrawResult],
+        max_concurrency: Optional[int] = None,
+        on_delivery: Optional[Callable[[int, DeliveryResult], None]] = None,
+        **kwargs
+    ) -> List[DeliveryResult]:
+        """`dispatch` for asyncio callers. Providers without an async client run it on a worker thread."""
+        return await asyncio.to_thread(self.dispatch, results, max_concurrency, on_delivery, **kwargs)
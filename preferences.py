@@ -0,0 +1,69 @@
+"""Cost matrices for best draws, built from a roster's soft preferences."""
+from typing import Dict, List
+from models import Participant, PastDraw, Preference, Roster
+
+
+def numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("numpy package not installed. Run: pip install numpy scipy")
+    return numpy
+
+
+def linear_sum_assignment():
+    try:
+        numpy()
+        from scipy.optimize import linear_sum_assignment
+    except ImportError:
+        raise ImportError("scipy package not installed. Run: pip install numpy scipy")
+    return linear_sum_assignment
+
+
+def _codes(np, participants: List[Participant], attributes: Dict[str, Dict[str, str]], attribute: str):
+    """Each participant's value of `attribute` as an integer code, -1 when they have none."""
+    values: Dict[str, int] = {}
+    codes = np.full(len(participants), -1, dtype=np.int64)
+    for i, participant in enumerate(participants):
+        value = attributes.get(participant.name, {}).get(attribute)
+        if value is not None:
+            codes[i] = values.setdefault(value.strip().lower(), len(values))
+    return codes
+
+
+def preference_costs(
+    participants: List[Participant],
+    preferences: List[Preference],
+    attributes: Dict[str, Dict[str, str]],
+    history: List[PastDraw]
+):
+    """An n x n float matrix of pairing costs, in participant order."""
+    np = numpy()
+    n = len(participants)
+    costs = np.zeros((n, n))
+    for preference in preferences:
+        if preference.prefer == 'new':
+            by_name = {participant.name: i for i, participant in enumerate(participants)}
+            # The last draw costs the full weight, the one before half of it, and so on.
+            for age, past in enumerate(sorted(history, key=lambda past: past.year, reverse=True), 1):
+                for giver_name, receiver_name in past.pairs:
+                    g, r = by_name.get(giver_name), by_name.get(receiver_name)
+                    if g is not None and r is not None:
+                        costs[g, r] += preference.weight / age
+            continue
+
+        codes = _codes(np, participants, attributes, preference.attribute)
+        # People missing the attribute are not penalised by preferences on it.
+        known = codes >= 0
+        compared = known[:, None] & known[None, :]
+        same = codes[:, None] == codes[None, :]
+        disliked = compared & (~same if preference.prefer == 'same' else same)
+        costs += preference.weight * disliked
+    return costs
+
+
+def roster_costs(roster: Roster):
+    """Costs for `roster`'s preferences, or None when it has none."""
+    if not roster.preferences:
+        return None
+    return preference_costs(roster.participants, roster.preferences, roster.attributes, roster.history)
@@ -0,0 +1,83 @@
+import os
+import threading
+from typing import Callable, Dict, List
+from config import Config
+from notification_service import NotificationService
+
+
+class ServiceRegistry:
+    """
+    Process-wide, lazily built configuration and notification services.
+
+    Services are created once and reused across requests and threads, so the
+    provider clients keep their connection pools and TLS sessions. A process
+    forked after initialization (e.g. a gunicorn worker) rebuilds its own
+    clients rather than sharing the parent's sockets.
+    """
+
+    def __init__(self, config_factory: Callable[[], Config] = Config):
+        self._config_factory = config_factory
+        self._lock = threading.Lock()
+        self._config = None
+        self._services: Dict[str, NotificationService] = {}
+        self._pid = os.getpid()
+
+    def config(self) -> Config:
+        if self._config is None:
+            with self._lock:
+                if self._config is None:
+                    config = self._config_factory()
+                    for name, path in config.notification_backends.items():
+                        NotificationService.register_backend(name, path)
+                    self._config = config
+        return self._config
+
+    def service(self, name: str) -> NotificationService:
+        """The service for a backend name; 'email' and 'sms' use the backends chosen by EMAIL_BACKEND and SMS_BACKEND."""
+        backend = self._backend_name(name)
+        return self._get(backend, NotificationService.backend(backend).from_config)
+
+    def preload(self, *names: str) -> None:
+        """Load the configuration and import the named backends and their SDKs, without building any services."""
+        config = self.config()
+        for name in names:
+            NotificationService.backend(self._backend_name(name)).preload(config)
+
+    def _backend_name(self, name: str) -> str:
+        config = self.config()
+        return {'email': config.email_backend, 'sms': config.sms_backend}.get(name, name)
+
+    def email_service(self) -> NotificationService:
+        return self.service('email')
+
+    def sms_service(self) -> NotificationService:
+        return self.service('sms')
+
+    def created(self) -> List[NotificationService]:
+        """Services this process has already built."""
+        return list(self._services.values())
+
+    def reset(self) -> None:
+        with self._lock:
+            self._config = None
+            self._services = {}
+
+    def _get(self, name: str, factory: Callable[[Config], NotificationService]) -> NotificationService:
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._services = {}
+                    self._pid = os.getpid()
+
+        service = self._services.get(name)
+        if service is None:
+            config = self.config()
+            with self._lock:
+                service = self._services.get(name)
+                if service is None:
+                    service = factory(config)
+                    self._services[name] = service
+        return service
+
+
+registry = ServiceRegistry()
@@ -0,0 +1,157 @@
+import hashlib
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Optional, Tuple
+from limits.storage import Storage
+
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), 'secret_santa_shared.db')
+
+# Fraction of writes that also sweep out every expired row.
+SWEEP_PROBABILITY = 0.01
+
+
+_local = threading.local()
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    """
+    This thread's autocommit connection to `path`.
+
+    Connections are kept open because closing the last one to a WAL
+    database forces a checkpoint and fsync. A forked process opens its own.
+    """
+    if getattr(_local, 'pid', None) != os.getpid():
+        _local.connections = {}
+        _local.pid = os.getpid()
+    db = _local.connections.get(path)
+    if db is None:
+        db = sqlite3.connect(path, timeout=10, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        _local.connections[path] = db
+    return db
+
+
+def close_connections() -> None:
+    """Close this thread's connections, e.g. in a server's master process before it forks workers."""
+    for db in getattr(_local, 'connections', {}).values():
+        db.close()
+    _local.connections = {}
+
+
+class SQLiteStorage(Storage):
+    """
+    Rate limit counters in a SQLite file, shared by every worker on the host.
+
+    Registered with `limits` as the `sqlite://` scheme: `sqlite:///path/to/file.db`,
+    or `sqlite://` for the default file in the temp directory. Supports the
+    fixed-window strategy that api.limit uses. For limits shared
+    across hosts, point RATELIMIT_STORAGE_URI at Redis instead.
+    """
+
+    STORAGE_SCHEME = ['sqlite']
+
+    def __init__(self, uri: Optional[str] = None, wrap_exceptions: bool = False, **options):
+        path = uri[len('sqlite://'):] if uri else ''
+        self.path = path or DEFAULT_PATH
+        with _connect(self.path) as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits ("
+                "key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL NOT NULL)"
+            )
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self) -> Tuple[type, ...]:
+        return (sqlite3.Error,)
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        now = time.time()
+        with _connect(self.path) as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                if random.random() < SWEEP_PROBABILITY:
+                    db.execute("DELETE FROM rate_limits WHERE expires_at <= ?", (now,))
+                else:
+                    db.execute("DELETE FROM rate_limits WHERE key = ? AND expires_at <= ?", (key, now))
+                db.execute(
+                    "INSERT INTO rate_limits VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value",
+                    (key, amount, now + expiry)
+                )
+                value = db.execute("SELECT value FROM rate_limits WHERE key = ?", (key,)).fetchone()[0]
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return value
+
+    def get(self, key: str) -> int:
+        with _connect(self.path) as db:
+            row = db.execute("SELECT value FROM rate_limits WHERE key = ? AND expires_at > ?", (key, time.time())).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        with _connect(self.path) as db:
+            row = db.execute("SELECT expires_at FROM rate_limits WHERE key = ? AND expires_at > ?", (key, time.time())).fetchone()
+        return row[0] if row else time.time()
+
+    def check(self) -> bool:
+        try:
+            with _connect(self.path) as db:
+                db.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> Optional[int]:
+        with _connect(self.path) as db:
+            return db.execute("DELETE FROM rate_limits").rowcount
+
+    def clear(self, key: str) -> None:
+        with _connect(self.path) as db:
+            db.execute("DELETE FROM rate_limits WHERE key = ?", (key,))
+
+
+class SharedCache:
+    """Small string cache with per-entry expiry, in a SQLite file shared by every worker on the host."""
+
+    def __init__(self, path: Optional[str] = None, namespace: str = 'default'):
+        self.path = path or DEFAULT_PATH
+        self.namespace = namespace
+        with _connect(self.path) as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+
+    @staticmethod
+    def key(*parts: bytes) -> str:
+        """A fixed-length key for a combination of values, none of which can be read back from it."""
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(hashlib.sha256(part).digest())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with _connect(self.path) as db:
+            row = db.execute(
+                "SELECT value FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (self.namespace, key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        now = time.time()
+        with _connect(self.path) as db:
+            if random.random() < SWEEP_PROBABILITY:
+                db.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+            db.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                (self.namespace, key, value, now + ttl)
+            )
@@ -0,0 +1,109 @@
+"""SMS text composition with segment counting."""
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+GSM7_BASIC = frozenset(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+# Sent as an escape plus the character, so each takes two septets.
+GSM7_EXTENSION = frozenset("\f^{}\\[~]|€")
+
+# Capacity of a lone segment, and of each segment of a split (concatenated) message.
+SEGMENT_SIZES = {'GSM-7': (160, 153), 'UCS-2': (70, 67)}
+
+# Richest first. Every variant takes the giver's and the receiver's name.
+VARIANTS = (
+    "🎅 Ho ho ho, {name}!\n\n🎁 You are buying a gift for:\n✨ {receiver_name} ✨\n\nKeep it secret! 🤫",
+    "Ho ho ho, {name}!\n\nYou are buying a gift for:\n{receiver_name}\n\nKeep it secret!",
+    "{name}, your Secret Santa is {receiver_name}. Keep it secret!",
+)
+
+
+@dataclass(frozen=True)
+class SegmentCount:
+    encoding: str
+    # Septets for GSM-7, UTF-16 code units for UCS-2.
+    length: int
+    segments: int
+
+
+def _units(text: str) -> Tuple[str, List[int]]:
+    """The encoding `text` needs and the size of each of its characters in that encoding."""
+    if all(char in GSM7_BASIC or char in GSM7_EXTENSION for char in text):
+        return 'GSM-7', [2 if char in GSM7_EXTENSION else 1 for char in text]
+    return 'UCS-2', [2 if ord(char) > 0xFFFF else 1 for char in text]
+
+
+def count_segments(text: str) -> SegmentCount:
+    """
+    Encoding and segment count for `text`.
+
+    Split messages are filled one character at a time, since an escaped
+    GSM-7 character or a UTF-16 surrogate pair is never divided between
+    segments.
+    """
+    encoding, units = _units(text)
+    single, multi = SEGMENT_SIZES[encoding]
+    length = sum(units)
+    if length <= single:
+        return SegmentCount(encoding, length, 1)
+    segments, used = 1, 0
+    for size in units:
+        if used + size > multi:
+            segments += 1
+            used = 0
+        used += size
+    return SegmentCount(encoding, length, segments)
+
+
+@dataclass
+class SMSEstimate:
+    """Segments, and their estimated cost, for a batch of messages."""
+    messages: int = 0
+    segments: int = 0
+    cost: float = 0.0
+    by_encoding: Dict[str, int] = field(default_factory=dict)
+
+    def summary(self, currency: str = '$') -> str:
+        encodings = ', '.join(f"{count} {encoding}" for encoding, count in sorted(self.by_encoding.items()))
+        average = self.segments / self.messages if self.messages else 0
+        return (
+            f"{self.messages} SMS ({encodings}), {self.segments} segment(s), "
+            f"{average:.2f} per message, estimated cost {currency}{self.cost:.2f}"
+        )
+
+
+class SMSComposer:
+    """
+    Renders draw notifications as SMS text.
+
+    Without `max_segments` every message is the richest variant. With it,
+    each message is the richest variant that fits in that many segments, or
+    the plainest when none does (e.g. for very long or non-GSM names).
+    """
+
+    def __init__(self, max_segments: Optional[int] = None, segment_cost: float = 0.0):
+        if max_segments is not None and max_segments < 1:
+            raise ValueError("max_segments must be at least 1")
+        self.max_segments = max_segments
+        self.segment_cost = segment_cost
+
+    def compose(self, name: str, receiver_name: str) -> Tuple[str, SegmentCount]:
+        for variant in VARIANTS:
+            text = variant.format(name=name, receiver_name=receiver_name)
+            count = count_segments(text)
+            if self.max_segments is None or count.segments <= self.max_segments:
+                return text, count
+        return text, count
+
+    def estimate(self, pairs: Iterable[Tuple[str, str]]) -> SMSEstimate:
+        """Segments and cost of composing one message per (name, receiver_name) pair."""
+        estimate = SMSEstimate()
+        for name, receiver_name in pairs:
+            count = self.compose(name, receiver_name)[1]
+            estimate.messages += 1
+            estimate.segments += count.segments
+            estimate.by_encoding[count.encoding] = estimate.by_encoding.get(count.encoding, 0) + 1
+        estimate.cost = estimate.segments * self.segment_cost
+        return estimate
@@ -1,52 +1,93 @@
-from typing import List
-from models import DrawResult
+from typing import Callable, List, Optional
+from models import DrawResult, DeliveryResult, Participant
 from notification_service import NotificationService
+from sms_composer import SMSComposer
+import metrics
 
 
 class TwilioSMSService(NotificationService):
-    def __init__(self, account_sid: str, auth_token: str, from_number: str = None, from_name: str = None):
+    channel = 'SMS'
+    address_label = 'phone number'
+    # Twilio sends 1 message segment per second from a long-code number and queues the rest.
+    default_rate_limit = 1.0
+
+    def __init__(
+        self,
+        account_sid: str,
+        auth_token: str,
+        from_number: str = None,
+        from_name: str = None,
+        max_concurrency: int = 1,
+        rate_limit: Optional[float] = None,
+        max_segments: Optional[int] = None,
+        segment_cost: float = 0.0
+    ):
         try:
             from twilio.rest import Client
         except ImportError:
             raise ImportError("twilio package not installed. Run: pip install twilio")
-        
+
         if not from_number and not from_name:
             raise ValueError("Either from_number or from_name must be provided")
-        
+
+        super().__init__(max_concurrency, rate_limit)
         self.client = Client(account_sid, auth_token)
         self.from_number = from_number
         self.from_name = from_name
+        self.composer = SMSComposer(max_segments, segment_cost)
+
+    @classmethod
+    def from_config(cls, config) -> 'TwilioSMSService':
+        config.validate_sms()
+        return cls(
+            account_sid=config.twilio_account_sid,
+            auth_token=config.twilio_auth_token,
+            from_number=config.twilio_from_number,
+            from_name=config.twilio_from_name,
+            max_concurrency=config.notification_concurrency,
+            rate_limit=config.sms_rate_limit,
+            max_segments=config.sms_max_segments,
+            segment_cost=config.sms_segment_cost
+        )
+
+    @classmethod
+    def preload(cls, config) -> None:
+        cls.preload_module('twilio.rest')
+
+    def recipient_address(self, participant: Participant) -> Optional[str]:
+        return participant.phone_number
 
     def send_notification(self, recipient: str, recipient_name: str, receiver_name: str) -> bool:
         try:
-            message = self._format_message(recipient_name, receiver_name)
-            from_sender = self.from_name if self.from_name else self.from_number
-            self.client.messages.create(
-                body=message,
-                from_=from_sender,
-                to=recipient
-            )
+            self.delivery.call(self._submit, recipient, recipient_name, receiver_name)
             return True
         except Exception as e:
             print(f"Failed to send SMS to {recipient}: {e}")
             return False
 
-    def send_draw_results(self, results: List[DrawResult]) -> None:
-        for result in results:
-            if not result.giver.phone_number:
-                print(f"✗ Skipping {result.giver.name} - no phone number provided")
-                continue
-            
-            success = self.send_notification(
-                result.giver.phone_number,
-                result.giver.name,
-                result.receiver.name
-            )
-            if success:
-                print(f"✓ Sent SMS to {result.giver.name}")
-            else:
-                print(f"✗ Failed to send SMS to {result.giver.name}")
-
-    def _format_message(self, name: str, receiver_name: str) -> str:
-        return f"🎅 Ho ho ho, {name}!\n\n🎁 You are buying a gift for:\n✨ {receiver_name} ✨\n\nKeep it secret! 🤫"
+    def _submit(self, recipient: str, recipient_name: str, receiver_name: str) -> None:
+        message, count = self.composer.compose(recipient_name, receiver_name)
+        metrics.inc('sms_segments_total', count.segments, encoding=count.encoding)
+        from_sender = self.from_name if self.from_name else self.from_number
+        self.client.messages.create(
+            body=message,
+            from_=from_sender,
+            to=recipient
+        )
 
+    def send_draw_results(
+        self,
+        results: List[DrawResult],
+        on_delivery: Optional[Callable[[int, DeliveryResult], None]] = None
+    ) -> List[DeliveryResult]:
+        estimate = self.composer.estimate((r.giver.name, r.receiver.name) for r in results if r.giver.phone_number)
+        print(f"Sending {estimate.summary()}")
+        deliveries = self.dispatch(results, on_delivery=on_delivery)
+        for delivery in deliveries:
+            if delivery.status == 'sent':
+                print(f"✓ Sent SMS to {delivery.giver}")
+            elif delivery.status == 'skipped':
+                print(f"✗ Skipping {delivery.giver} - no phone number provided")
+            else:
+                print(f"✗ Failed to send SMS to {delivery.giver}: {delivery.reason}")
+        return deliveries
@@ -0,0 +1,78 @@
+"""Responses rendered once and served from memory, precompressed and with strong ETags."""
+import gzip
+import hashlib
+from typing import Dict
+
+# Browsers may keep a copy but must revalidate it, so a deploy is picked up on the next load.
+CACHE_CONTROL = 'no-cache'
+# Server preference among the encodings a client accepts.
+ENCODINGS = ('br', 'gzip')
+
+
+def _brotli(body: bytes):
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(body, quality=11)
+
+
+class CachedResponse:
+    def __init__(self, body: bytes, content_type: str, cache_control: str = CACHE_CONTROL):
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.encoded: Dict[str, bytes] = {'identity': body}
+        for encoding, compressed in (('gzip', gzip.compress(body, 9, mtime=0)), ('br', _brotli(body))):
+            # Tiny bodies (like the config JSON) can grow when compressed.
+            if compressed is not None and len(compressed) < len(body):
+                self.encoded[encoding] = compressed
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        # Strong validators are per representation, so each encoding has its own.
+        self.etags = {
+            encoding: f'"{digest}"' if encoding == 'identity' else f'"{digest}-{encoding}"'
+            for encoding in self.encoded
+        }
+
+    def negotiate(self, accept_encoding: str) -> str:
+        """The best stored encoding the client accepts, per its Accept-Encoding header."""
+        accepted: Dict[str, float] = {}
+        for item in accept_encoding.split(','):
+            coding, _, params = item.partition(';')
+            quality = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            if coding.strip():
+                accepted[coding.strip().lower()] = quality
+        for encoding in ENCODINGS:
+            if encoding in self.encoded and accepted.get(encoding, accepted.get('*', 0.0)) > 0:
+                return encoding
+        return 'identity'
+
+    def not_modified(self, if_none_match: str, encoding: str) -> bool:
+        """Whether an If-None-Match header matches the representation in `encoding` (weak comparison, per RFC 9110)."""
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or any(tag.removeprefix('W/') == self.etags[encoding] for tag in tags)
+
+    def headers(self, encoding: str) -> Dict[str, str]:
+        headers = {
+            'Content-Type': self.content_type,
+            'ETag': self.etags[encoding],
+            'Cache-Control': self.cache_control,
+            'Vary': 'Accept-Encoding',
+        }
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        return headers
+
+    def respond(self, accept_encoding: str, if_none_match: str):
+        """(status, headers, body) for a request with these headers."""
+        encoding = self.negotiate(accept_encoding)
+        if self.not_modified(if_none_match, encoding):
+            return 304, self.headers(encoding), b''
+        return 200, self.headers(encoding), self.encoded[encoding]
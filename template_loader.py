@@ -1,5 +1,33 @@
 import os
-from typing import Optional
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+PLACEHOLDER_PATTERN = re.compile(r'\{(recipient_name|receiver_name|gift_limit|custom_message)\}')
+
+# Compiled templates by path and modification time, shared by every loader in the process
+# (and with forked workers, when compiled before the fork).
+_compiled: Dict[str, Tuple[float, List[str]]] = {}
+_compiled_lock = threading.Lock()
+
+
+def compile_template(template_path: str) -> List[str]:
+    """
+    Template split into alternating literal text and placeholder names.
+
+    Even positions are literals and odd positions are placeholder names.
+    The file is only re-read when its modification time changes.
+    """
+    mtime = os.stat(template_path).st_mtime
+    entry = _compiled.get(template_path)
+    if entry is None or entry[0] != mtime:
+        with _compiled_lock:
+            entry = _compiled.get(template_path)
+            if entry is None or entry[0] != mtime:
+                with open(template_path, 'r', encoding='utf-8') as f:
+                    entry = (mtime, PLACEHOLDER_PATTERN.split(f.read()))
+                _compiled[template_path] = entry
+    return entry[1]
 
 
 class TemplateLoader:
@@ -8,22 +36,33 @@ class TemplateLoader:
             raise FileNotFoundError(f"Email template file not found: {template_path}")
         self.template_path = template_path
 
-    def render(self, recipient_name: str, receiver_name: str, message: str = '', gift_limit: str = '$100') -> str:
+    def _compiled(self) -> List[str]:
         if not self.template_path:
             raise ValueError("No template path provided")
-        
-        with open(self.template_path, 'r', encoding='utf-8') as f:
-            template_content = f.read()
-        
-        html = template_content.replace('{recipient_name}', recipient_name)
-        html = html.replace('{receiver_name}', receiver_name)
-        html = html.replace('{gift_limit}', gift_limit)
-        
-        if message:
-            message_html = f'<div style="background-color: #fff9e6; border-left: 4px solid #ff9800; padding: 15px; margin: 20px 0; border-radius: 4px;"><p style="margin: 0; font-style: italic; color: #333;">{message}</p></div>'
-            html = html.replace('{custom_message}', message_html)
-        else:
-            html = html.replace('{custom_message}', '')
-        
-        return html
+        return compile_template(self.template_path)
+
+    def render(self, recipient_name: str, receiver_name: str, message: str = '', gift_limit: str = '$100') -> str:
+        return self.render_many([(recipient_name, receiver_name)], message, gift_limit)[0]
+
+    def render_many(self, pairs: Iterable[Tuple[str, str]], message: str = '', gift_limit: str = '$100') -> List[str]:
+        """Render one email per (recipient_name, receiver_name) pair, sharing the message and gift limit."""
+        segments = self._compiled()
+        values = {
+            'gift_limit': gift_limit,
+            'custom_message': self._message_html(message),
+        }
+
+        rendered = []
+        for recipient_name, receiver_name in pairs:
+            values['recipient_name'] = recipient_name
+            values['receiver_name'] = receiver_name
+            parts = segments.copy()
+            for i in range(1, len(parts), 2):
+                parts[i] = values[parts[i]]
+            rendered.append(''.join(parts))
+        return rendered
 
+    def _message_html(self, message: str) -> str:
+        if not message:
+            return ''
+        return f'<div style="background-color: #fff9e6; border-left: 4px solid #ff9800; padding: 15px; margin: 20px 0; border-radius: 4px;"><p style="margin: 0; font-style: italic; color: #333;">{message}</p></div>'
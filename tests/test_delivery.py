@@ -0,0 +1,165 @@
+import threading
+import time
+import pytest
+from delivery import (
+    PERMANENT, THROTTLED, TRANSIENT, CircuitBreaker, CircuitOpenError, DeliveryPipeline, RetryPolicy, classify,
+)
+from fake_service import FakeNotificationService, FakeProvider, FakeProviderError
+from models import DrawResult, Participant
+
+NO_BACKOFF = {TRANSIENT: RetryPolicy(attempts=3), THROTTLED: RetryPolicy(attempts=3)}
+
+
+class StatusError(Exception):
+    def __init__(self, status=None, status_code=None, response=None):
+        super().__init__('provider error')
+        self.status = status
+        self.status_code = status_code
+        self.response = response
+
+
+class Response:
+    def __init__(self, status_code, headers):
+        self.status_code = status_code
+        self.headers = headers
+
+
+class ReadTimeout(Exception):
+    """Named like requests' timeout, which classify recognises without importing requests."""
+
+
+@pytest.mark.parametrize('error, expected', [
+    (StatusError(status=429), (THROTTLED, None)),
+    (FakeProviderError(429, 'Too many requests', retry_after=2), (THROTTLED, 2.0)),
+    (StatusError(response=Response(429, {'Retry-After': '7'})), (THROTTLED, 7.0)),
+    (StatusError(response=Response(429, {'Retry-After': 'soon'})), (THROTTLED, None)),
+    (StatusError(status_code=503), (TRANSIENT, None)),
+    (StatusError(status=408), (TRANSIENT, None)),
+    (StatusError(status=400), (PERMANENT, None)),
+    (StatusError(status_code=401), (PERMANENT, None)),
+    (ConnectionError('reset'), (TRANSIENT, None)),
+    (TimeoutError(), (TRANSIENT, None)),
+    (ReadTimeout(), (TRANSIENT, None)),
+    (ValueError('bad address'), (PERMANENT, None)),
+])
+def test_classify(error, expected):
+    assert classify(error) == expected
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.trips == 0
+    breaker.record_failure()
+    assert breaker.trips == 1
+
+
+def test_breaker_lets_one_trial_through_after_the_timeout():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    started = time.monotonic()
+    breaker.before_call()
+    assert time.monotonic() - started >= 0.04
+    assert breaker.probing
+
+    # A second caller waits for the trial's outcome.
+    admitted = threading.Event()
+    waiter = threading.Thread(target=lambda: (breaker.before_call(), admitted.set()))
+    waiter.start()
+    assert not admitted.wait(0.1)
+    breaker.record_success()
+    assert admitted.wait(1)
+    waiter.join()
+    assert (breaker.trips, breaker.failures, breaker.probing) == (0, 0, False)
+
+
+def test_breaker_fails_fast_after_max_trips():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01, max_trips=2)
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.trips == 2
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    # Once the next trial is due it is let through, and success closes the circuit.
+    time.sleep(0.02)
+    breaker.before_call()
+    breaker.record_success()
+    breaker.before_call()
+
+
+def test_pipeline_retries_transient_errors():
+    pipeline = DeliveryPipeline(policies=NO_BACKOFF)
+    errors = [ConnectionError('reset'), StatusError(status=502)]
+
+    def send():
+        if errors:
+            raise errors.pop(0)
+        return 'sent'
+
+    assert pipeline.call(send) == 'sent'
+    assert pipeline.breaker.failures == 0
+
+
+def test_pipeline_gives_up_on_permanent_errors_at_once():
+    pipeline = DeliveryPipeline(policies=NO_BACKOFF)
+    calls = []
+
+    def send():
+        calls.append(1)
+        raise StatusError(status=400)
+
+    with pytest.raises(StatusError):
+        pipeline.call(send)
+    assert len(calls) == 1
+
+
+def test_pipeline_pauses_for_retry_after():
+    pipeline = DeliveryPipeline(policies=NO_BACKOFF)
+    errors = [FakeProviderError(429, 'Too many requests', retry_after=0.1)]
+
+    def send():
+        if errors:
+            raise errors.pop(0)
+        return time.monotonic()
+
+    started = time.monotonic()
+    assert pipeline.call(send) - started >= 0.09
+
+
+def results(*names, address=True):
+    people = [Participant(name=name, email=f"{name}@example.com" if address else None) for name in names]
+    return [DrawResult(giver, people[(i + 1) % len(people)]) for i, giver in enumerate(people)]
+
+
+def test_dispatch_with_the_fake_provider():
+    provider = FakeProvider(latency=0)
+    service = FakeNotificationService(provider, max_concurrency=4)
+    draw = results('a', 'b', 'c', 'd') + results('e', 'f', address=False)
+
+    deliveries = service.dispatch(draw)
+
+    assert [(d.giver, d.status) for d in deliveries] == [
+        ('a', 'sent'), ('b', 'sent'), ('c', 'sent'), ('d', 'sent'), ('e', 'skipped'), ('f', 'skipped'),
+    ]
+    assert provider.stats['accepted'] == 4
+
+
+def test_dispatch_fails_fast_when_the_provider_is_down():
+    provider = FakeProvider(latency=0, error_rate=1.0)
+    service = FakeNotificationService(provider, max_concurrency=2)
+    service.delivery = DeliveryPipeline(
+        policies=NO_BACKOFF, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60, max_trips=1)
+    )
+
+    started = time.monotonic()
+    deliveries = service.dispatch(results('a', 'b', 'c', 'd', 'e', 'f'))
+
+    assert time.monotonic() - started < 5
+    assert {d.status for d in deliveries} == {'failed'}
+    assert any('Provider unavailable' in d.reason for d in deliveries)
+    assert provider.stats['accepted'] == 0
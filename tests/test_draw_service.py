@@ -0,0 +1,159 @@
+import random
+import pytest
+from models import Block, Couple, ExclusionGroup, Participant
+from draw_service import DrawService
+
+
+def people(n):
+    return [Participant(name=f"person-{i}", email=f"person-{i}@example.com") for i in range(n)]
+
+
+def assert_valid(assignment, participants, couples=(), groups=(), blocks=()):
+    pairs = assignment.pairs()
+    assert sorted(giver for giver, _ in pairs) == sorted(p.name for p in participants)
+    assert sorted(receiver for _, receiver in pairs) == sorted(p.name for p in participants)
+    forbidden = {(b.giver.name, b.receiver.name) for b in blocks}
+    for couple in couples:
+        forbidden |= {(couple.person1.name, couple.person2.name), (couple.person2.name, couple.person1.name)}
+    for group in groups:
+        forbidden |= {(a.name, b.name) for a in group.members for b in group.members}
+    for giver, receiver in pairs:
+        assert giver != receiver
+        assert (giver, receiver) not in forbidden
+
+
+def cycle_length(assignment):
+    receiver_of = dict(assignment.pairs())
+    start = person = next(iter(receiver_of))
+    length = 0
+    while True:
+        person = receiver_of[person]
+        length += 1
+        if person == start:
+            return length
+
+
+@pytest.mark.parametrize('mode', ['random', 'single_cycle'])
+def test_draw_respects_constraints(mode):
+    random.seed(1)
+    participants = people(60)
+    couples = [Couple(participants[0], participants[1]), Couple(participants[2], participants[3])]
+    groups = [ExclusionGroup(participants[10:20], 'team'), ExclusionGroup(participants[20:25])]
+    blocks = [Block(participants[30], participants[31]), Block(participants[40], participants[0])]
+    service = DrawService(participants, couples, groups, blocks, mode=mode)
+    for _ in range(20):
+        assert_valid(service.draw(), participants, couples, groups, blocks)
+
+
+def test_single_cycle_is_one_chain():
+    random.seed(2)
+    participants = people(200)
+    groups = [ExclusionGroup(participants[i:i + 10]) for i in range(0, 100, 10)]
+    assignment = DrawService(participants, groups=groups, mode='single_cycle').draw()
+    assert_valid(assignment, participants, groups=groups)
+    assert cycle_length(assignment) == len(participants)
+
+
+def test_dense_constraints_fall_back_to_matching():
+    random.seed(3)
+    participants = people(12)
+    # Two teams of five leave their members only each other's team and the two outsiders.
+    groups = [ExclusionGroup(participants[:5]), ExclusionGroup(participants[5:10])]
+    service = DrawService(participants, groups=groups)
+    for _ in range(50):
+        assert_valid(service.draw(), participants, groups=groups)
+
+
+def test_infeasible_draw_names_the_stuck_participants():
+    participants = people(3)
+    groups = [ExclusionGroup(participants[:2])]
+    with pytest.raises(ValueError) as excinfo:
+        DrawService(participants, groups=groups).draw()
+    assert str(excinfo.value) == (
+        "Cannot generate a valid Secret Santa draw: 2 participant(s) "
+        "(person-0, person-1) can only be assigned to 1 possible receiver(s)"
+    )
+
+
+def test_infeasible_single_cycle_reports_the_stuck_participants():
+    participants = people(4)
+    groups = [ExclusionGroup(participants[:3])]
+    # Three team members share the only outsider, so any two of them are already stuck.
+    with pytest.raises(ValueError, match=r"^Cannot generate a single gift chain: 2 participant\(s\) .* can only be assigned to 1 "):
+        DrawService(participants, groups=groups, mode='single_cycle').draw()
+
+
+@pytest.mark.parametrize('participants, message', [
+    (people(1), "Need at least 2 participants"),
+    (people(3), "Unknown draw mode 'chaos'"),
+])
+def test_invalid_inputs(participants, message):
+    with pytest.raises(ValueError, match=message):
+        DrawService(participants, mode='chaos' if len(participants) > 1 else 'random')
+
+
+def test_constraint_on_unknown_participant():
+    participants = people(3)
+    with pytest.raises(ValueError, match="Couple member stranger not in participants list"):
+        DrawService(participants, couples=[Couple(participants[0], Participant(name='stranger'))])
+
+
+def test_redraw_after_dropout_changes_only_the_dropouts_giver():
+    random.seed(4)
+    participants = people(50)
+    previous = dict(DrawService(participants).draw().pairs())
+    dropout = participants[7]
+    remaining = [p for p in participants if p is not dropout]
+
+    assignment, changed = DrawService(remaining).redraw(previous)
+
+    assert_valid(assignment, remaining)
+    giver_of_dropout = next(giver for giver, receiver in previous.items() if receiver == dropout.name)
+    assert [remaining[g].name for g in changed] == [giver_of_dropout]
+    assert dict(assignment.pairs())[giver_of_dropout] == previous[dropout.name]
+
+
+def test_redraw_after_joining_splices_in_the_newcomer():
+    random.seed(5)
+    participants = people(50)
+    previous = dict(DrawService(participants).draw().pairs())
+    newcomer = Participant(name='newcomer')
+    roster = participants + [newcomer]
+
+    assignment, changed = DrawService(roster).redraw(previous)
+
+    assert_valid(assignment, roster)
+    assert len(changed) == 2
+    assert newcomer.name in {roster[g].name for g in changed}
+    pairs = dict(assignment.pairs())
+    assert sum(pairs[giver] != receiver for giver, receiver in previous.items()) == 1
+
+
+def test_redraw_replaces_pairs_a_new_constraint_forbids():
+    random.seed(6)
+    participants = people(30)
+    previous = dict(DrawService(participants).draw().pairs())
+    by_name = {p.name: p for p in participants}
+    giver, receiver = next(iter(previous.items()))
+    blocks = [Block(by_name[giver], by_name[receiver])]
+
+    service = DrawService(participants, blocks=blocks)
+    assignment, changed = service.redraw(previous)
+
+    assert_valid(assignment, participants, blocks=blocks)
+    assert giver in {participants[g].name for g in changed}
+    # Only the blocked giver and the kept pairs reopened to make room for them may change.
+    assert 'redraw_fallback' not in service.stats
+    assert len(changed) <= 1 + service.stats['reopened']
+
+
+def test_redraw_of_single_cycle_stays_one_chain():
+    random.seed(7)
+    participants = people(40)
+    previous = dict(DrawService(participants, mode='single_cycle').draw().pairs())
+    remaining = participants[:-1] + [Participant(name='newcomer')]
+
+    assignment, _ = DrawService(remaining, mode='single_cycle').redraw(previous)
+
+    assert_valid(assignment, remaining)
+    assert cycle_length(assignment) == len(remaining)
@@ -0,0 +1,146 @@
+import pytest
+from draw_request import DrawRequestError
+from draw_store import DrawStore
+from events import Events
+from models import DeliveryResult
+
+
+def person(name):
+    return {'name': name, 'email': f"{name}@example.com"}
+
+
+ROSTER = {'participants': [person(name) for name in ('alice', 'bob', 'carol', 'dan', 'erin', 'frank')]}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = DrawStore(str(tmp_path / 'draws.db'))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def events(store):
+    return Events(store)
+
+
+def draw_and_deliver(events, store, event_id, failed=()):
+    """Draw an event and record its notifications as sent, except to the givers in `failed`."""
+    results, options, notify = events.draw(event_id)
+    draw_id, _ = store.create(list(results), 'email', options, notify=notify)
+    for i in range(len(results)) if notify is None else notify:
+        status = 'failed' if results[i].giver.name in failed else 'sent'
+        store.record(draw_id, i, DeliveryResult(results[i].giver.name, results[i].receiver.name, status))
+    events.drawn(event_id, draw_id)
+    return results, notify
+
+
+def test_update_is_reapplied_when_a_concurrent_change_lands_first(store):
+    event_id, _ = store.create_event({'participants': [person('alice')]})
+    other = DrawStore(store.path)
+    calls = []
+
+    def add_bob(roster):
+        calls.append(len(roster['participants']))
+        if len(calls) == 1:
+            # Another process changes the event between this read and this write.
+            other.update_event(event_id, lambda r: {**r, 'participants': r['participants'] + [person('carol')]})
+        return {**roster, 'participants': roster['participants'] + [person('bob')]}
+
+    version, roster = store.update_event(event_id, add_bob)
+
+    assert calls == [1, 2]
+    assert version == 3
+    assert [p['name'] for p in roster['participants']] == ['alice', 'carol', 'bob']
+    assert store.event_roster(event_id) == (3, roster)
+    other.close()
+
+
+def test_update_of_unknown_event(store):
+    assert store.update_event('missing', lambda roster: roster) is None
+
+
+def test_cached_roster_is_the_one_stored_after_a_race(store, events):
+    event_id, _ = events.create(ROSTER)
+    racing_store = DrawStore(store.path)
+    racing = Events(racing_store)
+    update_event = store.update_event
+
+    def racing_update(event_id, change):
+        def change_after_race(roster):
+            if len(roster['participants']) == len(ROSTER['participants']):
+                racing.add_participant(event_id, person('grace'))
+            return change(roster)
+        return update_event(event_id, change_after_race)
+
+    store.update_event = racing_update
+    assert events.add_participant(event_id, person('heidi')) == 3
+
+    results, _, _ = events.draw(event_id)
+    assert sorted(p.name for p in results.participants) == sorted(
+        [p['name'] for p in ROSTER['participants']] + ['grace', 'heidi']
+    )
+    racing_store.close()
+
+
+def test_invalid_change_is_not_stored(events, store):
+    event_id, _ = events.create(ROSTER)
+    with pytest.raises(DrawRequestError, match="'zoe' is not in this event"):
+        events.remove_participant(event_id, 'zoe')
+    with pytest.raises(DrawRequestError, match='unique'):
+        events.add_participant(event_id, person('alice'))
+    assert store.event(event_id) == (1, None)
+
+
+def test_first_draw_notifies_everyone(events, store):
+    event_id, _ = events.create(ROSTER)
+    results, notify = draw_and_deliver(events, store, event_id)
+    assert notify is None
+    assert len(results) == len(ROSTER['participants'])
+
+
+def test_redraw_notifies_only_givers_whose_receiver_left(events, store):
+    event_id, _ = events.create(ROSTER)
+    first, _ = draw_and_deliver(events, store, event_id)
+    before = dict(first.pairs())
+    events.remove_participant(event_id, 'carol')
+
+    second, notify = draw_and_deliver(events, store, event_id)
+
+    after = dict(second.pairs())
+    carols_giver = next(giver for giver, receiver in before.items() if receiver == 'carol')
+    assert [second.participants[i].name for i in notify] == [carols_giver]
+    assert after[carols_giver] == before['carol']
+    assert {g: r for g, r in after.items() if g != carols_giver} == {
+        g: r for g, r in before.items() if g not in ('carol', carols_giver)
+    }
+
+
+def test_redraw_renotifies_changed_contacts_and_failed_deliveries(events, store):
+    event_id, _ = events.create(ROSTER)
+    first, _ = draw_and_deliver(events, store, event_id, failed={'bob'})
+    roster = {'participants': [
+        {'name': 'dan', 'email': 'dan@new.example.com'} if p['name'] == 'dan' else p for p in ROSTER['participants']
+    ]}
+    events.replace(event_id, roster)
+
+    second, notify = draw_and_deliver(events, store, event_id)
+
+    assert dict(second.pairs()) == dict(first.pairs())
+    assert sorted(second.participants[i].name for i in notify) == ['bob', 'dan']
+
+
+def test_event_is_redacted_for_anyone_but_its_owner(events, store):
+    event_id, owner_token = events.create(ROSTER)
+    draw_and_deliver(events, store, event_id)
+
+    public = events.get(event_id)
+    assert public['roster']['participants'][0] == {'name': 'alice'}
+    assert 'draw_id' not in public
+
+    assert not events.is_owner(event_id, None)
+    assert not events.is_owner(event_id, 'guess')
+    assert events.is_owner(event_id, owner_token)
+    owner = events.get(event_id, owner=True)
+    assert owner['roster']['participants'][0] == person('alice')
+    assert owner['draw_id']
@@ -0,0 +1,130 @@
+import json
+import pytest
+import json_loader
+from json_loader import RosterError, load_roster
+
+ROSTER = {
+    'participants': [
+        {'name': 'Alice', 'email': 'alice@example.com', 'office': 'Leeds'},
+        {'name': 'Bob', 'email': 'bob@example.com', 'groups': ['design']},
+        {'name': 'Carol', 'phone_number': '+441234567890', 'groups': ['design']},
+        {'name': 'Dan', 'email': 'dan@example.com'},
+    ],
+    'couples': [{'person1': 'Alice', 'person2': 'Dan'}],
+    'blocks': [{'giver': 'Carol', 'receiver': 'Alice'}],
+    'preferences': [{'prefer': 'different', 'attribute': 'office', 'weight': 2}],
+}
+
+
+@pytest.fixture(params=[1, 7, 64, 64 * 1024], ids=lambda size: f"chunk-{size}")
+def chunk_size(request, monkeypatch):
+    """Run with reads that split values and tokens at every possible place, up to the real chunk size."""
+    monkeypatch.setattr(json_loader, 'CHUNK_SIZE', request.param)
+    return request.param
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def test_streamed_json_matches_the_document(tmp_path, chunk_size):
+    roster = load_roster(write(tmp_path, 'roster.json', json.dumps(ROSTER, indent=2)))
+
+    assert [p.name for p in roster.participants] == ['Alice', 'Bob', 'Carol', 'Dan']
+    assert roster.participants[2].phone_number == '+441234567890'
+    assert [(c.person1.name, c.person2.name) for c in roster.couples] == [('Alice', 'Dan')]
+    assert [[m.name for m in g.members] for g in roster.groups] == [['Bob', 'Carol']]
+    assert [(b.giver.name, b.receiver.name) for b in roster.blocks] == [('Carol', 'Alice')]
+    assert roster.attributes == {'Alice': {'office': 'Leeds'}}
+    assert roster.preferences[0].weight == 2
+
+
+def test_errors_are_reported_together(tmp_path, chunk_size):
+    data = {
+        'participants': [
+            {'name': 'Alice', 'email': 'shared@example.com'},
+            {'email': 'nobody@example.com'},
+            {'name': 'Bob', 'email': 'shared@example.com'},
+            {'name': 'Alice'},
+            {'name': 42},
+            {'name': 'Carol', 'phone_number': 441234567890},
+        ],
+        'couples': [{'person1': 'Alice', 'person2': 'Zoe'}],
+        'blocks': [{'giver': 'Bob', 'receiver': 'Yuri'}],
+        'preferences': [{'prefer': 'sometimes'}],
+    }
+    with pytest.raises(RosterError) as excinfo:
+        load_roster(write(tmp_path, 'roster.json', json.dumps(data)))
+
+    assert excinfo.value.errors == [
+        "participants[1]: participant has no name",
+        "participants[2]: email shared@example.com is used by both 'Alice' and 'Bob'",
+        "participants[3]: duplicate participant name 'Alice'",
+        "participants[4]: participant name must be a string, got 42",
+        "participants[5]: phone number of 'Carol' must be a string",
+        "preferences[0]: preference needs 'prefer' set to one of same, different, new",
+        "couples[0]: Couple member 'Zoe' not found in participants",
+        "blocks[0]: Blocked receiver 'Yuri' not found in participants",
+    ]
+
+
+def test_error_report_is_capped(tmp_path, chunk_size):
+    data = {'participants': [{'email': f'person-{i}@example.com'} for i in range(120)]}
+    with pytest.raises(RosterError) as excinfo:
+        load_roster(write(tmp_path, 'roster.json', json.dumps(data)))
+
+    assert len(excinfo.value.errors) == 120
+    message = str(excinfo.value)
+    assert message.startswith("Found 120 problem(s) in participants:")
+    assert message.endswith("- ...and 70 more")
+
+
+@pytest.mark.parametrize('text', [
+    '{"participants": [{"name": "Alice"}, {"name": "Bob"}]} {"participants": []}',
+    '{"participants": [{"name": "Alice"}, {"name": "Bob"}]}\n]',
+    '{} trailing',
+])
+def test_data_after_the_roster_is_rejected(tmp_path, chunk_size, text):
+    with pytest.raises(RosterError, match="unexpected data after the roster's closing"):
+        load_roster(write(tmp_path, 'roster.json', text))
+
+
+def test_trailing_whitespace_is_allowed(tmp_path, chunk_size):
+    roster = load_roster(write(tmp_path, 'roster.json', '{"participants": [{"name": "Alice"}, {"name": "Bob"}]}\n\n  '))
+    assert len(roster.participants) == 2
+
+
+def test_malformed_json_is_a_decode_error(tmp_path, chunk_size):
+    with pytest.raises(json.JSONDecodeError):
+        load_roster(write(tmp_path, 'roster.json', '{"participants": [{"name": "Alice"}, {"name": '))
+
+
+def test_jsonl_reports_bad_lines_and_keeps_going(tmp_path):
+    lines = [
+        '{"type": "participant", "name": "Alice"}',
+        'not json',
+        '["an", "array"]',
+        '{"name": "Bob"}',
+        '',
+        '{"type": "couple", "person1": "Alice", "person2": "Nobody"}',
+    ]
+    with pytest.raises(RosterError) as excinfo:
+        load_roster(write(tmp_path, 'roster.jsonl', '\n'.join(lines)))
+
+    errors = excinfo.value.errors
+    assert errors[0].startswith("line 2: invalid JSON")
+    assert errors[1:] == [
+        "line 3: expected an object",
+        "line 6: Couple member 'Nobody' not found in participants",
+    ]
+
+
+def test_csv_rows_with_groups(tmp_path):
+    text = "name,email,phone_number,groups\nAlice,alice@example.com,,design;ops\nBob,,+441234567890,design\nCarol,,,ops\n"
+    roster = load_roster(write(tmp_path, 'roster.csv', text))
+
+    assert [p.name for p in roster.participants] == ['Alice', 'Bob', 'Carol']
+    assert roster.participants[1].email is None
+    assert sorted(sorted(m.name for m in g.members) for g in roster.groups) == [['Alice', 'Bob'], ['Alice', 'Carol']]